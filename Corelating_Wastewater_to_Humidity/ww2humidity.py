@@ -1,44 +1,25 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 import os
+import sys
 from scipy.stats import pearsonr
 
-def load_wastewater(path):
-    """
-    Load wastewater data and prepare for merging.
-    """
-    df = pd.read_csv(path)
-    df['Sample_Date'] = pd.to_datetime(df['Sample_Date'])
-    df = df.set_index('Sample_Date')
-    return df
-
-def load_weather(path):
-    """
-    Load weather data and prepare for merging.
-    """
-    df = pd.read_csv(path)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
-    
-    # Remove timezone and normalize to date only
-    df.index = df.index.tz_localize(None)
-    df.index = df.index.normalize()
-    return df
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corelating_Weather_to_Wastewater'))
+from artifacts import get_store
+from panel import PLANTS, PROJECT_DIR, build_panel
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import MAX_GAP_DAYS
+from regression_panel import fit_panel, lagged_pairs, predict, select_fit
 
-def merge_and_correlate(wastewater_csv, weather_csv, location_name):
+def merge_and_correlate(panel, location_name, mode='interpolated'):
     """
-    Merges wastewater and weather datasets and computes correlations 
-    between viral gene copies and humidity.
+    Takes one plant's viral gene copies and humidity from the aligned panel
+    and computes their correlation.
+    `mode` is 'interpolated' (daily grid) or 'native' / 'native_window'
+    (real sample dates only, see Panel.frame). Interpolated days inside
+    sampling gaps longer than MAX_GAP_DAYS are skipped.
     """
-    wastewater_data = load_wastewater(wastewater_csv)
-    weather_data = load_weather(weather_csv)
-    
-    # Merge on date index
-    df = wastewater_data.join(weather_data, how='inner')
-    
-    # Extract relevant columns
-    df = df[['Mean viral gene copies/L', 'avg_humidity_%']].dropna()
+    df = panel.frame(location_name, ['Mean viral gene copies/L', 'avg_humidity_%'],
+                     mode=mode, max_gap=MAX_GAP_DAYS)
     
     if len(df) == 0:
         print(f"No matching data found for {location_name}")
@@ -55,9 +36,12 @@ def merge_and_correlate(wastewater_csv, weather_csv, location_name):
     
     return df, correlation
 
-def plot_correlation(df, location_name, correlation):
+def plot_correlation(df, location_name, correlation, fit=None, inputs=(), params=None):
     """
     Create scatter plot with humidity on x-axis and viral gene copies on y-axis.
+    The trend line is read from `fit` (a regression_panel.fit_panel row) when given.
+    The PNG is stored in the artifact store (Output/) and linked next to the
+    script, with `inputs` and `params` recorded in the manifest.
     """
     if df is None or len(df) == 0:
         return
@@ -67,9 +51,10 @@ def plot_correlation(df, location_name, correlation):
                 alpha=0.6, s=50, edgecolors='black', linewidth=0.5)
     
     # Add trend line
-    z = np.polyfit(df['avg_humidity_%'], df['Mean viral gene copies/L'], 1)
-    p = np.poly1d(z)
-    plt.plot(df['avg_humidity_%'], p(df['avg_humidity_%']), 
+    if fit is None:
+        pairs = lagged_pairs(df, ['avg_humidity_%'], 'Mean viral gene copies/L', key={'plant': location_name})
+        fit = select_fit(fit_panel(pairs), plant=location_name)
+    plt.plot(df['avg_humidity_%'], predict(fit, df['avg_humidity_%']), 
              "r--", alpha=0.8, linewidth=2, label=f'Trend line (r={correlation:.3f})')
     
     plt.xlabel('Average Humidity (%)', fontsize=12, fontweight='bold')
@@ -82,42 +67,40 @@ def plot_correlation(df, location_name, correlation):
     # Save plot in the same directory as the script
     script_dir = os.path.dirname(os.path.abspath(__file__))
     filename = os.path.join(script_dir, f'{location_name.replace(" ", "_")}_humidity_correlation.png')
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
+    get_store().save_figure(plt.gcf(), os.path.basename(filename), links=[filename],
+                            inputs=inputs, params=params, dpi=300, bbox_inches='tight')
     print(f"Plot saved as: {filename}\n")
     plt.close()
 
-def main():
+def main(mode='interpolated'):
     """
     Main function to process all three locations.
     """
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_dir = os.path.join(script_dir, '..', 'ECE143-Project-Group9')
-    
-    # Define file paths
-    locations = {
-        'Encina': {
-            'wastewater': os.path.join(project_dir, 'Wastewater_Data', 'Encina_sewage_qPCR_Modified.csv'),
-            'weather': os.path.join(project_dir, 'weather_Encina.csv')
-        },
-        'Point Loma': {
-            'wastewater': os.path.join(project_dir, 'Wastewater_Data', 'PointLoma_sewage_qPCR_Modified.csv'),
-            'weather': os.path.join(project_dir, 'weather_Point Loma.csv')
-        },
-        'South Bay': {
-            'wastewater': os.path.join(project_dir, 'Wastewater_Data', 'SouthBay_sewage_qPCR_Modified.csv'),
-            'weather': os.path.join(project_dir, 'weather_South Bay.csv')
-        }
-    }
+    # All three locations' wastewater and weather, read and aligned once
+    panel = build_panel(covid_path=None)
     
     correlations = {}
+    frames = {}
+    pairs = []
     
     # Process each location
-    for location_name, paths in locations.items():
-        df, corr = merge_and_correlate(paths['wastewater'], paths['weather'], location_name)
+    for location_name in PLANTS:
+        df, corr = merge_and_correlate(panel, location_name, mode=mode)
         if df is not None:
-            plot_correlation(df, location_name, corr)
+            frames[location_name] = df
             correlations[location_name] = corr
+            pairs += lagged_pairs(df, ['avg_humidity_%'], 'Mean viral gene copies/L', key={'plant': location_name})
+    
+    # Fit all trend lines in one batched solve
+    if pairs:
+        fits = fit_panel(pairs)
+        for location_name, df in frames.items():
+            ww_file, weather_file = PLANTS[location_name]
+            plot_correlation(df, location_name, correlations[location_name],
+                             fit=select_fit(fits, plant=location_name),
+                             inputs=[os.path.join(PROJECT_DIR, 'Wastewater_Data', ww_file),
+                                     os.path.join(PROJECT_DIR, 'Weather_Data', weather_file)],
+                             params={'mode': mode, 'max_gap': MAX_GAP_DAYS})
     
     # Print summary
     print("\n" + "=" * 50)
@@ -1,32 +1,33 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
-def load_wastewater(path):
+import sys
 
-    df = pd.read_csv(path)
-    df['Sample_Date'] = pd.to_datetime(df['Sample_Date'])
-    df = df.set_index('Sample_Date')
-    return df
+from artifacts import get_store
+from panel import PLANTS, PROJECT_DIR, build_panel
 
-def load_weather(path):
-    df = pd.read_csv(path)
-    df['date'] = pd.to_datetime(df['date'])
-    df = df.set_index('date')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import MAX_GAP_DAYS
+from smoothing import box
+from regression_panel import fit_panel, lagged_pairs, predict, select_fit
 
-    df.index = df.index.tz_localize(None)   
-    df.index = df.index.normalize()         
-    return df
+# "interpolated" (daily grid) or "native" / "native_window" (real sample dates only)
+MODE = "interpolated"
+# interpolated days inside longer sampling gaps are left out of the correlations
+MAX_GAP = MAX_GAP_DAYS
+# weekly means need at least this many real samples in their window
+MIN_WEEK_SAMPLES = 1
 
+# adjacent on the panel's variable axis, so the slice is a view
+COLUMNS = ["zscore", "max_temp_c", "min_temp_c"]
 
-def merge_and_correlate(wastewater_csv, weather_csv):
+
+def merge_and_correlate(panel, plant, mode="interpolated"):
     '''
-    Merges wastewater and weather datasets and computes correlations between Z-scores and temperature.
+    Takes one plant's Z-scores and temperatures from the aligned panel and computes their correlations.
+    `mode` selects the daily interpolated grid or the native sample dates (see Panel.frame).
     '''
-    wastewater_data = load_wastewater(wastewater_csv)
-    weather_data = load_weather(weather_csv)
-
-    df = wastewater_data.join(weather_data, how='inner')
+    df = panel.frame(plant, COLUMNS, mode=mode, max_gap=MAX_GAP)
 
     df['avg_temp'] = (df['min_temp_c'] + df['max_temp_c']) / 2
 
@@ -42,22 +43,35 @@ def merge_and_correlate(wastewater_csv, weather_csv):
 
     return df
 
-def weekly_correlation(wastewater_data, weather_data, window=7):
+def weekly_correlation(panel, plant, window=7, mode="interpolated"):
     """
     Computes 7-day rolling-average correlations between wastewater z-scores
-    and weather
+    and weather.
+    The trailing means run over the panel's daily axis, so the window is
+    `window` calendar days in every mode; on the native sample grid the
+    z-score mean only uses the real samples in the window.
+    Weekly values whose window holds fewer than MIN_WEEK_SAMPLES real samples,
+    or that fall inside a gap longer than MAX_GAP days, are dropped.
     """
 
-    df = wastewater_data.join(weather_data, how="inner")
+    df = panel.frame(plant, COLUMNS, dropna=False)
+    if mode != "interpolated":
+        df.loc[~df.index.isin(panel.coverage[plant].dates), "zscore"] = np.nan
 
     df["avg_temp"] = (df["min_temp_c"] + df["max_temp_c"]) / 2
 
-    df = df.sort_index()
+    columns = ["zscore", "min_temp_c", "max_temp_c", "avg_temp"]
+    week_columns = ["z_week", "min_week_temp_c", "max_week_temp_c", "avg_week_temp_c"]
+    # all trailing means in one pass over a (columns x days) matrix
+    min_periods = None if mode == "interpolated" else 1
+    df[week_columns] = box(df[columns].to_numpy(dtype=float).T, window, center=False,
+                           min_periods=min_periods).T
 
-    df["z_week"]   = df["zscore"].rolling(window=window).mean()
-    df["min_week_temp_c"] = df["min_temp_c"].rolling(window=window).mean()
-    df["max_week_temp_c"] = df["max_temp_c"].rolling(window=window).mean()
-    df["avg_week_temp_c"] = df["avg_temp"].rolling(window=window).mean()
+    coverage = panel.coverage[plant]
+    sparse = ~coverage.windows_with(df.index, window, MIN_WEEK_SAMPLES) | coverage.in_gap(df.index, MAX_GAP)
+    df.loc[sparse, week_columns] = np.nan
+    if mode != "interpolated":
+        df = df[df.index.isin(coverage.dates)]
 
     df2 = df.dropna()
 
@@ -75,21 +89,28 @@ def weekly_correlation(wastewater_data, weather_data, window=7):
 
 
 
-def plot_correlation(df, x_column, y_column, location_name="location"):
+def plot_correlation(df, x_column, y_column, location_name="location", fit=None, inputs=()):
     """
     Creates a scatter plot with regression line, labels it,
     labels correlation, and saves as PNG.
+
+    The regression line and correlation are read from `fit`, a row of the
+    regression_panel.fit_panel table; it is only fitted here when not given.
+    The PNG goes into the artifact store (Output/) and is linked next to this
+    script; `inputs` are recorded in the manifest.
     """
 
     x = df[x_column].values
     y = df[y_column].values
 
-    # Compute regression line
-    slope, intercept = np.polyfit(x, y, 1)
-    reg_line = slope * x + intercept
+    if fit is None:
+        pairs = lagged_pairs(df, [x_column], y_column, key={"plant": location_name})
+        fit = select_fit(fit_panel(pairs), x=x_column)
 
-    # Compute correlation
-    corr = df[x_column].corr(df[y_column])
+    # Regression line and correlation from the fit table
+    slope = fit["slope"]
+    reg_line = predict(fit, x)
+    corr = fit["r"]
 
     # Create plot
     plt.figure(figsize=(8, 6))
@@ -131,49 +152,45 @@ def plot_correlation(df, x_column, y_column, location_name="location"):
         f"{location_name.replace(' ', '_')}_{y_column}_vs_{x_column}.png"
     )
 
-    plt.savefig(filename, dpi=300, bbox_inches="tight")
+    params = {"mode": MODE, "max_gap": MAX_GAP, "x": x_column, "y": y_column, "plant": location_name}
+    get_store().save_figure(plt.gcf(), os.path.basename(filename), links=[filename],
+                            inputs=inputs, params=params, dpi=300, bbox_inches="tight")
     print(f"Plot saved as: {filename}\n")
 
     plt.close()
 
-print("Encina Corelation Results:")
-df=merge_and_correlate("Wastewater_Data/Encina_sewage_qPCR_Modified.csv","weather_Encina.csv")
-
-plot_correlation(df, "avg_temp", "zscore", location_name="Encina")
-plot_correlation(df, "max_temp_c", "zscore", location_name="Encina")
-
-print("Encina Weekly Results:")
-df2=weekly_correlation(
-    load_wastewater("Wastewater_Data/Encina_sewage_qPCR_Modified.csv"),
-    load_weather("weather_Encina.csv")
-)
-plot_correlation(df2, "max_week_temp_c", "z_week", location_name="Encina_Weekly")
-
-
-print("PointLoma Corelation Results:")
-df=merge_and_correlate("Wastewater_Data/PointLoma_sewage_qPCR_Modified.csv","weather_Point Loma.csv")
-plot_correlation(df, "avg_temp", "zscore", location_name="PointLoma")
-plot_correlation(df, "max_temp_c", "zscore", location_name="PointLoma")
-plot_correlation(df, "max_temp_c", "zscore", location_name="PointLoma")
-
-print("PointLoma Weekly Results:")
-df2=weekly_correlation(
-    load_wastewater("Wastewater_Data/PointLoma_sewage_qPCR_Modified.csv"),
-    load_weather("weather_Point Loma.csv")
-)
-plot_correlation(df2, "max_week_temp_c", "z_week", location_name="PointLoma_Weekly")
-
-
-print("South Bay Corelation Results:")
-df=merge_and_correlate("Wastewater_Data/SouthBay_sewage_qPCR_Modified.csv","weather_South Bay.csv")
-
-plot_correlation(df, "avg_temp", "zscore", location_name="South Bay")
-plot_correlation(df, "max_temp_c", "zscore", location_name="South Bay")
-
-print("South Bay Weekly Results:")
-df2=weekly_correlation(
-    load_wastewater("Wastewater_Data/SouthBay_sewage_qPCR_Modified.csv"),
-    load_weather("weather_South Bay.csv")
-)
-
-plot_correlation(df2, "max_week_temp_c", "z_week", location_name="South Bay_Weekly")
+# plot file name prefix of each panel plant
+LABELS = {"Encina": "Encina", "Point Loma": "PointLoma", "South Bay": "South Bay"}
+
+# every plant's wastewater and weather, read and aligned once
+panel = build_panel(covid_path=None)
+
+daily_frames = {}
+weekly_frames = {}
+pairs = []
+for plant, location_name in LABELS.items():
+    print(f"{location_name} Corelation Results:")
+    df = merge_and_correlate(panel, plant, mode=MODE)
+    daily_frames[location_name] = df
+    pairs += lagged_pairs(df, ["avg_temp", "max_temp_c"], "zscore", key={"plant": location_name})
+
+    print(f"{location_name} Weekly Results:")
+    df2 = weekly_correlation(panel, plant, mode=MODE)
+    weekly_frames[location_name] = df2
+    pairs += lagged_pairs(df2, ["max_week_temp_c"], "z_week", key={"plant": f"{location_name}_Weekly"})
+
+# one batched solve for every plant's trend lines
+fits = fit_panel(pairs)
+
+for plant, location_name in LABELS.items():
+    ww_file, weather_file = PLANTS[plant]
+    inputs = [os.path.join(PROJECT_DIR, "Wastewater_Data", ww_file), os.path.join(PROJECT_DIR, "Weather_Data", weather_file)]
+
+    df = daily_frames[location_name]
+    for x_column in ["avg_temp", "max_temp_c"]:
+        plot_correlation(df, x_column, "zscore", location_name=location_name,
+                         fit=select_fit(fits, plant=location_name, x=x_column), inputs=inputs)
+
+    weekly_name = f"{location_name}_Weekly"
+    plot_correlation(weekly_frames[location_name], "max_week_temp_c", "z_week", location_name=weekly_name,
+                     fit=select_fit(fits, plant=weekly_name, x="max_week_temp_c"), inputs=inputs)
@@ -1,8 +1,18 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from scipy.stats import pearsonr, spearmanr, kendalltau
 
+from artifacts import get_store
+from panel import PLANTS, PROJECT_DIR, build_panel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import MAX_GAP_DAYS
+
 '''
 Notes
 - delay in dates will be taken into account from 0~21
@@ -39,109 +49,73 @@ def correlation_test_spearman(x, y):
     pass
 
 
-def main():
-    path_point_loma_csv = "/workspace/projects/Schoolwork/ECE 143 Programming for Data Science/team_project/ECE143-Project-Group9/Corelating_Weather_to_Wastewater/wind_to_wastewater/wind_to_wastewater_Point_loma.csv"
-    path_encina_csv = "/workspace/projects/Schoolwork/ECE 143 Programming for Data Science/team_project/ECE143-Project-Group9/Corelating_Weather_to_Wastewater/wind_to_wastewater/wind_to_wastewater_Encina.csv"
-    path_south_bay = "/workspace/projects/Schoolwork/ECE 143 Programming for Data Science/team_project/ECE143-Project-Group9/Corelating_Weather_to_Wastewater/wind_to_wastewater/wind_to_wastewater_South_Bay.csv"
-    path_output = "/workspace/projects/Schoolwork/ECE 143 Programming for Data Science/team_project/ECE143-Project-Group9/Corelating_Weather_to_Wastewater/wind_to_wastewater/Correlation_output.xlsx"
-
-    # Read data
-    df_point_loma = pd.read_csv(path_point_loma_csv)
-    df_encina = pd.read_csv(path_encina_csv)
-    df_south_bay = pd.read_csv(path_south_bay)
-
-    # Format output dataframes
-    writer = pd.ExcelWriter(path_output, engine='xlsxwriter')
-    df_result_point_loma = pd.DataFrame(index=[i for i in range(22)], columns=["Date Delay", "Pearson Coefficient", "Pearson p-value", "Spearman Coefficient", "Spearman p-value", "Kendall Coefficient", "Kendall p-value"])
-    df_result_encina = pd.DataFrame(index=[i for i in range(22)], columns=["Date Delay", "Pearson Coefficient", "Pearson p-value", "Spearman Coefficient", "Spearman p-value", "Kendall Coefficient", "Kendall p-value"])
-    df_result_south_bay = pd.DataFrame(index=[i for i in range(22)], columns=["Date Delay", "Pearson Coefficient", "Pearson p-value", "Spearman Coefficient", "Spearman p-value", "Kendall Coefficient", "Kendall p-value"])
-
-    # Point Loma
-    # Exclude data before 2022/03/14
-    date_index = df_point_loma.index[df_point_loma["Date"] == "2022-03-14"].tolist()[0]
-    df_point_loma = df_point_loma.iloc[date_index:]
-
+START_DATE = "2022-03-14"
+MAX_DELAY = 21
+PLANT_SHEETS = ["Point Loma", "Encina", "South Bay"]
 
-    for i in range(22):
-        wind_speed = df_point_loma["avg_wind_speed_m_s"].iloc[:-i].tolist() if i > 0 else df_point_loma["avg_wind_speed_m_s"].tolist()
-        viral_genes = df_point_loma["Mean viral gene copies/L"].iloc[i:].tolist()
-
-        df_result_point_loma.at[i, "Date Delay"] = i
-
-        r, p = pearsonr(wind_speed, viral_genes)
-        df_result_point_loma.at[i, "Pearson Coefficient"] = r
-        df_result_point_loma.at[i, "Pearson p-value"] = p
-
-        rho, p = spearmanr(wind_speed, viral_genes)
-        df_result_point_loma.at[i, "Spearman Coefficient"] = rho
-        df_result_point_loma.at[i, "Spearman p-value"] = p
-
-        tau, p = kendalltau(wind_speed, viral_genes)
-        df_result_point_loma.at[i, "Kendall Coefficient"] = tau
-        df_result_point_loma.at[i, "Kendall p-value"] = p
 
+def delay_correlations(df, max_delay=MAX_DELAY):
+    """
+    Pearson/Spearman/Kendall tests of wind speed against viral gene copies
+    delayed by 0..max_delay days.
 
-    # Encina
-    # Exclude data before 2022/03/14
-    date_index = df_encina.index[df_encina["Date"] == "2022-03-14"].tolist()[0]
-    df_encina = df_encina.iloc[date_index:]
+    Args:
+        df: daily frame with 'avg_wind_speed_m_s' and 'Mean viral gene copies/L' columns;
+            pairs with a missing value on either side (e.g. masked sampling gaps) are skipped
+        max_delay: largest delay (in rows/days) to test
+    Returns:
+        out: DataFrame with one row per delay
+    """
+    df_result = pd.DataFrame(index=[i for i in range(max_delay + 1)], columns=["Date Delay", "Pearson Coefficient", "Pearson p-value", "Spearman Coefficient", "Spearman p-value", "Kendall Coefficient", "Kendall p-value"])
 
+    wind = df["avg_wind_speed_m_s"].to_numpy(dtype=float)
+    viral = df["Mean viral gene copies/L"].to_numpy(dtype=float)
+    for i in range(max_delay + 1):
+        wind_speed = wind[:len(wind) - i]
+        viral_genes = viral[i:]
+        ok = np.isfinite(wind_speed) & np.isfinite(viral_genes)
+        wind_speed, viral_genes = wind_speed[ok], viral_genes[ok]
 
-    for i in range(22):
-        wind_speed = df_encina["avg_wind_speed_m_s"].iloc[:-i].tolist() if i > 0 else df_encina["avg_wind_speed_m_s"].tolist()
-        viral_genes = df_encina["Mean viral gene copies/L"].iloc[i:].tolist()
-        
-        df_result_encina.at[i, "Date Delay"] = i
+        df_result.at[i, "Date Delay"] = i
 
         r, p = pearsonr(wind_speed, viral_genes)
-        df_result_encina.at[i, "Pearson Coefficient"] = r
-        df_result_encina.at[i, "Pearson p-value"] = p
+        df_result.at[i, "Pearson Coefficient"] = r
+        df_result.at[i, "Pearson p-value"] = p
 
         rho, p = spearmanr(wind_speed, viral_genes)
-        df_result_encina.at[i, "Spearman Coefficient"] = rho
-        df_result_encina.at[i, "Spearman p-value"] = p
+        df_result.at[i, "Spearman Coefficient"] = rho
+        df_result.at[i, "Spearman p-value"] = p
 
         tau, p = kendalltau(wind_speed, viral_genes)
-        df_result_encina.at[i, "Kendall Coefficient"] = tau
-        df_result_encina.at[i, "Kendall p-value"] = p
-
-
-    # South Bay
-    # Exclude data before 2022/03/14
-    date_index = df_south_bay.index[df_south_bay["Date"] == "2022-03-14"].tolist()[0]
-    df_south_bay = df_south_bay.iloc[date_index:]
-
+        df_result.at[i, "Kendall Coefficient"] = tau
+        df_result.at[i, "Kendall p-value"] = p
 
-    for i in range(22):
-        wind_speed = df_south_bay["avg_wind_speed_m_s"].iloc[:-i].tolist() if i > 0 else df_south_bay["avg_wind_speed_m_s"].tolist()
-        viral_genes = df_south_bay["Mean viral gene copies/L"].iloc[i:].tolist()
-        
-        df_result_south_bay.at[i, "Date Delay"] = i
+    return df_result
 
-        r, p = pearsonr(wind_speed, viral_genes)
-        df_result_south_bay.at[i, "Pearson Coefficient"] = r
-        df_result_south_bay.at[i, "Pearson p-value"] = p
-
-        rho, p = spearmanr(wind_speed, viral_genes)
-        df_result_south_bay.at[i, "Spearman Coefficient"] = rho
-        df_result_south_bay.at[i, "Spearman p-value"] = p
 
-        tau, p = kendalltau(wind_speed, viral_genes)
-        df_result_south_bay.at[i, "Kendall Coefficient"] = tau
-        df_result_south_bay.at[i, "Kendall p-value"] = p
-
-
-    # Write to xlsx file
-    df_result_point_loma.to_excel(writer, sheet_name="Point Loma")
-    df_result_encina.to_excel(writer, sheet_name="Encina")
-    df_result_south_bay.to_excel(writer, sheet_name="South Bay")
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    path_output = os.path.join(script_dir, "wind_to_wastewater", "Correlation_output.xlsx")
+
+    # Read all plants once into the shared panel instead of the hand-joined CSVs
+    panel = build_panel(covid_path=None)
+
+    sheets = {}
+    for plant in PLANT_SHEETS:
+        # Exclude data before 2022/03/14 (binary search on the date axis) and keep
+        # the daily grid so delays stay in days; long sampling gaps become missing
+        df = panel.frame(plant, ["avg_wind_speed_m_s", "Mean viral gene copies/L"], start=START_DATE,
+                         dropna=False, max_gap=MAX_GAP_DAYS)
+        sheets[plant] = delay_correlations(df)
     print("Correlation Tests completed!")
 
-    writer.sheets["Point Loma"].autofit()
-    writer.sheets["Encina"].autofit()
-    writer.sheets["South Bay"].autofit()
-    writer.close()
+    # stored once in Output/ (skipped when unchanged) and linked at the old path
+    inputs = [os.path.join(PROJECT_DIR, folder, name)
+              for ww_file, weather_file in PLANTS.values()
+              for folder, name in (("Wastewater_Data", ww_file), ("Weather_Data", weather_file))]
+    get_store().save_workbook(sheets, "Correlation_output.xlsx", links=[path_output], inputs=inputs,
+                              params={"start": START_DATE, "max_delay": MAX_DELAY, "max_gap": MAX_GAP_DAYS})
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
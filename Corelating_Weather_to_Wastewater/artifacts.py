@@ -0,0 +1,267 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import zipfile
+
+import pandas as pd
+
+'''
+Content-addressed store for generated figures, CSVs and workbooks.
+
+Every artifact is hashed (sha256) and kept once under Output/objects/. The
+names in Output/ and the per-script copies (e.g. the PNG next to
+Wasterwater_temp_corelating.py) are relative symlinks to that object, and
+Output/manifest.json records, per artifact name, the object, its size, the
+input files (with their hashes) and the parameters that produced it.
+
+Writing an artifact whose content is already stored only checks the links, so
+re-running an analysis that produces the same bytes does no file I/O beyond
+hashing. For .xlsx files the hash ignores the zip timestamps and document
+properties, which change on every save without changing the workbook.
+
+When an artifact's content changes, its previous object is deleted as soon as
+no manifest entry refers to it any more; prune() sweeps whatever else is left
+unreferenced (e.g. after manifest entries were removed by hand), so
+Output/objects/ holds exactly one copy of each current artifact.
+
+Usage:
+    store = get_store()
+    store.save_figure(fig, "Encina_zscore_vs_max_temp_c.png",
+                      links=[os.path.join(script_dir, "Encina_zscore_vs_max_temp_c.png")],
+                      inputs=[wastewater_csv, weather_csv], params={"mode": "interpolated"})
+    store.save_csv(df, "weather_Encina.csv", links=["weather_Encina.csv"], index=False)
+    store.prune()
+
+    python artifacts.py <file> [...]   # move existing outputs into the store
+    python artifacts.py --prune        # delete unreferenced objects
+'''
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+OUTPUT_DIR = os.path.join(PROJECT_DIR, "Output")
+
+# zip members that only carry save-time metadata
+_VOLATILE_MEMBERS = {"docProps/core.xml", "docProps/app.xml"}
+
+_default_store = None
+_file_digests = {}
+
+
+def content_digest(data, suffix=""):
+    """sha256 of an artifact's content; workbooks are hashed member by member."""
+    if suffix.lower() == ".xlsx" and zipfile.is_zipfile(io.BytesIO(data)):
+        digest = hashlib.sha256()
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            for member in sorted(archive.namelist()):
+                if member in _VOLATILE_MEMBERS:
+                    continue
+                digest.update(member.encode())
+                digest.update(archive.read(member))
+        return digest.hexdigest()
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path):
+    """sha256 of a file, cached per (path, size, mtime) for the life of the process."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _file_digests[key] = digest.hexdigest()
+    return _file_digests[key]
+
+
+def _relative(path):
+    return os.path.relpath(os.path.abspath(path), PROJECT_DIR).replace(os.sep, "/")
+
+
+class ArtifactStore:
+    """
+    Objects stored once by content hash, exposed through links and a manifest.
+
+    Args:
+        root: directory holding objects/, manifest.json and one link per artifact name
+    """
+
+    def __init__(self, root=OUTPUT_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        self.stats = {"stored": 0, "deduplicated": 0, "linked": 0, "unchanged_links": 0, "removed": 0}
+
+    def object_path(self, digest, suffix):
+        return os.path.join(self.objects_dir, digest[:2], digest + suffix)
+
+    def put(self, data, name, links=(), inputs=(), params=None):
+        """
+        Store `data` under artifact `name` and point root/name and `links` at it.
+
+        Args:
+            data: artifact bytes
+            name: file name inside the store root (its suffix is kept on the object)
+            links: extra paths that should show the artifact (e.g. next to the script)
+            inputs: input file paths, recorded with their hashes
+            params: JSON-serializable parameters, recorded as given
+        Returns:
+            the content digest
+        """
+        suffix = os.path.splitext(name)[1]
+        digest = content_digest(data, suffix)
+        obj = self.object_path(digest, suffix)
+        if os.path.exists(obj):
+            self.stats["deduplicated"] += 1
+        else:
+            os.makedirs(os.path.dirname(obj), exist_ok=True)
+            tmp = obj + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, obj)
+            self.stats["stored"] += 1
+
+        targets = [os.path.join(self.root, name)] + [os.path.abspath(p) for p in links]
+        for target in targets:
+            self._link(obj, digest, target)
+
+        previous = self.manifest.get(name, {}).get("object")
+        entry = {
+            "object": _relative(obj),
+            "sha256": digest,
+            "bytes": len(data),
+            "links": [_relative(t) for t in targets],
+            "inputs": {_relative(os.path.realpath(p)): file_digest(p) for p in inputs},
+            "params": params or {},
+            "producer": _relative(sys.argv[0]) if sys.argv and sys.argv[0] else "",
+        }
+        if self.manifest.get(name) != entry:
+            self.manifest[name] = entry
+            self._write_manifest()
+        if previous is not None and previous != entry["object"]:
+            self._remove_if_unreferenced(previous)
+        return digest
+
+    def _referenced(self):
+        return {entry["object"] for entry in self.manifest.values()}
+
+    def _remove_if_unreferenced(self, relative_obj):
+        """Delete a replaced object once no artifact points at it."""
+        if relative_obj in self._referenced():
+            return
+        path = os.path.join(PROJECT_DIR, relative_obj)
+        if os.path.isfile(path):
+            os.remove(path)
+            self.stats["removed"] += 1
+
+    def prune(self, dry_run=False):
+        """
+        Delete every object (and leftover temporary file) under objects/ that
+        no manifest entry refers to, then drop empty fan-out directories.
+
+        Returns:
+            list of the deleted (or, with dry_run, deletable) paths
+        """
+        referenced = {os.path.normpath(os.path.join(PROJECT_DIR, obj)) for obj in self._referenced()}
+        removed = []
+        if not os.path.isdir(self.objects_dir):
+            return removed
+        for directory, _, files in os.walk(self.objects_dir, topdown=False):
+            for file in files:
+                path = os.path.normpath(os.path.join(directory, file))
+                if path in referenced:
+                    continue
+                removed.append(path)
+                if not dry_run:
+                    os.remove(path)
+            if not dry_run and directory != self.objects_dir and not os.listdir(directory):
+                os.rmdir(directory)
+        if not dry_run:
+            self.stats["removed"] += len(removed)
+        return removed
+
+    def _link(self, obj, digest, target):
+        """Make `target` a relative symlink to `obj`, leaving it alone if it already shows the same content."""
+        if os.path.islink(target) and os.path.realpath(target) == os.path.realpath(obj):
+            self.stats["unchanged_links"] += 1
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + ".tmp-link"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.symlink(os.path.relpath(obj, os.path.dirname(target)), tmp)
+        except OSError:
+            # no symlink support: fall back to a copy, written only when it differs
+            suffix = os.path.splitext(target)[1]
+            if os.path.isfile(target) and not os.path.islink(target):
+                with open(target, "rb") as f:
+                    if content_digest(f.read(), suffix) == digest:
+                        self.stats["unchanged_links"] += 1
+                        return
+            shutil.copyfile(obj, tmp)
+        os.replace(tmp, target)
+        self.stats["linked"] += 1
+
+    def _write_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, self.manifest_path)
+
+    def save_figure(self, fig, name, links=(), inputs=(), params=None, **savefig_kwargs):
+        """Render a matplotlib figure in memory and store it (format from the name's suffix)."""
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=os.path.splitext(name)[1].lstrip(".") or "png", **savefig_kwargs)
+        return self.put(buffer.getvalue(), name, links=links, inputs=inputs, params=params)
+
+    def save_csv(self, df, name, links=(), inputs=(), params=None, **to_csv_kwargs):
+        """Serialize a DataFrame to CSV in memory and store it."""
+        return self.put(df.to_csv(**to_csv_kwargs).encode(), name, links=links, inputs=inputs, params=params)
+
+    def save_workbook(self, sheets, name, links=(), inputs=(), params=None, autofit=True):
+        """Write {sheet name: DataFrame} into one in-memory .xlsx and store it."""
+        buffer = io.BytesIO()
+        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+            for sheet, df in sheets.items():
+                df.to_excel(writer, sheet_name=sheet)
+                if autofit:
+                    writer.sheets[sheet].autofit()
+        return self.put(buffer.getvalue(), name, links=links, inputs=inputs, params=params)
+
+    def adopt(self, path, name=None):
+        """Move an existing file into the store and replace it with a link."""
+        with open(path, "rb") as f:
+            data = f.read()
+        name = name or os.path.basename(path)
+        links = [] if os.path.abspath(path) == os.path.join(self.root, name) else [path]
+        return self.put(data, name, links=links)
+
+
+def get_store():
+    """Return the shared store rooted at Output/, creating it on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ArtifactStore()
+    return _default_store
+
+
+if __name__ == "__main__":
+    # python artifacts.py <file> [...]: move existing outputs into the store
+    # python artifacts.py --prune: delete objects no artifact refers to
+    store = get_store()
+    for path in sys.argv[1:]:
+        if path == "--prune":
+            for removed in store.prune():
+                print(f"removed {_relative(removed)}")
+        elif os.path.isfile(path) and not os.path.islink(path):
+            print(f"{path} -> {store.adopt(path)[:12]}")
+    print(store.stats)
@@ -0,0 +1,144 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import CoverageIndex
+
+'''
+Native-sampling-grid mode for the wastewater/weather correlations.
+
+The processed qPCR files are linearly interpolated onto a daily grid, so about
+half to two thirds of their rows are synthetic. In "native" mode the
+wastewater series is reduced to the dates that were actually sampled and the
+daily weather of the same day is attached to each sample, or the mean over the
+preceding k days. Correlations then run on real observations only.
+
+Modes accepted by align() and panel.Panel.frame (both go through select_mode):
+- "interpolated": the original daily grid
+- "native": real sample dates + the same day's weather
+- "native_window": real sample dates + mean weather over the preceding `window` days
+'''
+
+MODES = ("interpolated", "native", "native_window")
+
+
+def native_samples(wastewater, column="Mean viral gene copies/L", rtol=1e-6):
+    """
+    Return only the rows of a wastewater frame that are real qPCR samples.
+
+    Frames that are not on a regular daily grid are treated as raw sample
+    files and returned as they are. On the daily grid produced by
+    interpolate_daily, an interpolated day lies on the straight line between
+    its neighbours (zero second difference), so the real samples are the
+    knots where the second difference is non-zero, plus both endpoints.
+    """
+    df = wastewater.sort_index()
+    df = df[df[column].notna()]
+    if len(df) < 3:
+        return df
+
+    steps = np.diff(df.index.values).astype("timedelta64[D]").astype(np.int64)
+    if not np.all(steps == 1):
+        return df
+
+    v = df[column].to_numpy(dtype=np.float64)
+    d2 = np.abs(v[:-2] - 2 * v[1:-1] + v[2:])
+    knot = np.concatenate(([True], d2 > rtol * np.abs(v[1:-1]), [True]))
+    return df[knot]
+
+
+def select_mode(daily, sample_dates, weather_columns, mode="interpolated", window=7):
+    """
+    Apply a sampling mode to one plant's frame on a contiguous daily date index.
+
+    This is the single implementation of the modes, used by align() and by
+    panel.Panel.frame (and so by the analyses and benchmark_modes).
+
+    Args:
+        daily: frame with one row per calendar day (wastewater and weather columns)
+        sample_dates: dates of the real qPCR samples
+        weather_columns: columns averaged in "native_window" mode
+        mode: one of MODES; "interpolated" returns `daily` unchanged, "native"
+            keeps the sample dates with the same day's weather, "native_window"
+            first replaces the weather by its mean over the trailing `window`
+            days (days, since the index is daily)
+    Returns:
+        the selected rows
+    """
+    assert mode in MODES, f"mode must be one of {MODES}"
+    if mode == "interpolated":
+        return daily
+    if mode == "native_window" and len(weather_columns):
+        daily = daily.copy()
+        daily[weather_columns] = daily[weather_columns].rolling(window, min_periods=1).mean()
+    return daily[daily.index.isin(sample_dates)]
+
+
+def align(wastewater, weather, mode="interpolated", column="Mean viral gene copies/L",
+          window=7, max_gap=None):
+    """
+    Align wastewater and weather frames for one plant according to `mode` (see MODES).
+
+    With `max_gap`, interpolated days inside a gap of more than `max_gap`
+    days between real samples are dropped (see sampling_coverage.CoverageIndex).
+    Native rows without any weather on their day are dropped.
+    """
+    assert mode in MODES, f"mode must be one of {MODES}"
+
+    if mode == "interpolated":
+        df = wastewater.join(weather, how="inner")
+        if max_gap is not None:
+            coverage = CoverageIndex(native_samples(wastewater, column=column).index)
+            df = df[~coverage.in_gap(df.index, max_gap)]
+        return df
+
+    samples = native_samples(wastewater, column=column)
+    weather_columns = list(weather.select_dtypes("number").columns)
+    daily = samples.join(weather[weather_columns], how="outer").sort_index().asfreq("D")
+    df = select_mode(daily, samples.index, weather_columns, mode=mode, window=window)
+    return df.dropna(subset=weather_columns, how="all")
+
+
+def benchmark_modes(panel, plant, x_columns, y_column="zscore", repeat=5, **kwargs):
+    """
+    Time Panel.frame (the path the analyses use) + correlation for every mode
+    and report rows, memory and r.
+
+    Returns a DataFrame with one row per (mode, weather column).
+    """
+    rows = []
+    for mode in MODES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            df = panel.frame(plant, [y_column] + list(x_columns), mode=mode, dropna=False, **kwargs)
+            corrs = {x: df[y_column].corr(df[x]) for x in x_columns}
+        elapsed = (time.perf_counter() - start) / repeat
+
+        for x in x_columns:
+            rows.append({
+                "mode": mode,
+                "x": x,
+                "n": int(df[[x, y_column]].dropna().shape[0]),
+                "memory_bytes": int(df.memory_usage(deep=True).sum()),
+                "seconds": elapsed,
+                "r": corrs[x],
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from panel import WEATHER_VARS, build_panel
+
+    panel = build_panel(covid_path=None)
+
+    results = []
+    for name in panel.plants:
+        table = benchmark_modes(panel, name, WEATHER_VARS)
+        table.insert(0, "plant", name)
+        results.append(table)
+
+    print(pd.concat(results, ignore_index=True).to_string(index=False))
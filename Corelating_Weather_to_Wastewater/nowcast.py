@@ -0,0 +1,228 @@
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+from panel import build_panel
+
+'''
+Nowcasting weekly COVID Cases/Hospitalization from lagged wastewater and
+weather features and the target's own previous weeks with recursive least
+squares (RLS).
+
+The COVID targets are county-wide: build_panel copies the same weekly San
+Diego County series to every plant. The "per-plant" models therefore all
+predict the same series and differ only in which plant's wastewater and
+weather they use; comparing them compares the plants as predictors of the
+county, not plant-level outcomes.
+
+Each model keeps a coefficient vector and an inverse-covariance matrix, so a
+new week costs O(features^2) instead of a refit. All models of a backtest
+(plants x targets x lag configurations) are stacked and updated together,
+which makes a rolling-origin backtest over every plant and configuration a
+loop over weeks of small batched array operations. Every model is scored next
+to a naive baseline that repeats the last observed week.
+'''
+
+FEATURES = ["zscore", "max_temp_c", "avg_humidity_%"]
+TARGETS = ["Cases", "Hospitalization"]
+LAG_CONFIGS = [(0,), (0, 1), (0, 1, 2), (1,), (1, 2), (1, 2, 3)]
+# weeks of the target's own history used as autoregressive features (>= 1,
+# the current week is what is being nowcast)
+AR_LAGS = (1,)
+
+
+class RecursiveLeastSquares:
+    """
+    Batched RLS with exponential forgetting.
+
+    Args:
+        n_models: number of independent models updated together
+        n_features: length of each feature vector (include a 1 for the intercept)
+        forgetting: weight of past weeks per step (1.0 = ordinary least squares)
+        delta: initial inverse-covariance scale (large = weak prior)
+    """
+
+    def __init__(self, n_models, n_features, forgetting=0.98, delta=1e4):
+        self.forgetting = forgetting
+        self.theta = np.zeros((n_models, n_features))
+        self.P = np.tile(np.eye(n_features) * delta, (n_models, 1, 1))
+        self.n_updates = np.zeros(n_models, dtype=int)
+
+    def predict(self, X):
+        """Predictions for X of shape (n_models, n_features)."""
+        return np.einsum("mk,mk->m", X, self.theta)
+
+    def update(self, X, y):
+        """
+        One RLS step per model; models with a NaN in X or y are left unchanged.
+        """
+        ok = np.isfinite(y) & np.isfinite(X).all(axis=1)
+        if not ok.any():
+            return
+        X = np.where(ok[:, None], X, 0.0)
+        y = np.where(ok, y, 0.0)
+        lam = self.forgetting
+
+        Px = np.einsum("mij,mj->mi", self.P, X)
+        denom = lam + np.einsum("mi,mi->m", X, Px)
+        gain = Px / denom[:, None]
+        err = y - self.predict(X)
+
+        theta = self.theta + gain * err[:, None]
+        P = (self.P - np.einsum("mi,mj->mij", gain, Px)) / lam
+
+        self.theta = np.where(ok[:, None], theta, self.theta)
+        self.P = np.where(ok[:, None, None], P, self.P)
+        self.n_updates += ok
+
+
+def weekly_panel(panel, features=FEATURES, targets=TARGETS):
+    """
+    Aggregate the daily panel onto COVID weeks.
+
+    Features are averaged over the 7 days ending on each week's WkEndActual
+    (the days where the targets are present); missing days are ignored.
+    The targets are the county-wide series, identical for every plant.
+
+    Returns:
+        weeks: DatetimeIndex of week end dates
+        X: (weeks, plants, features) weekly feature means
+        Y: (weeks, plants, targets) weekly targets (the same county values on every plant)
+    """
+    target_vals = panel.sel(variable=list(targets))
+    week_rows = np.flatnonzero(np.isfinite(target_vals).all(axis=(1, 2)))
+    weeks = panel.dates[week_rows]
+
+    feat, mask = panel.sel(variable=list(features), with_mask=True)
+    # cumulative sums give every 7-day window mean in one subtraction
+    zeros = np.zeros((1,) + feat.shape[1:])
+    csum = np.concatenate((zeros, np.cumsum(np.where(mask, feat, 0.0), axis=0)))
+    ccount = np.concatenate((zeros, np.cumsum(mask, axis=0)))
+    hi = week_rows + 1
+    lo = np.clip(hi - 7, 0, None)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        X = (csum[hi] - csum[lo]) / (ccount[hi] - ccount[lo])
+
+    Y = target_vals[week_rows]
+    return weeks, X, Y
+
+
+def _shift(A, lag):
+    """A shifted `lag` weeks forward along axis 0; the first `lag` weeks are NaN."""
+    shifted = np.full_like(A, np.nan)
+    shifted[lag:] = A[:A.shape[0] - lag]
+    return shifted
+
+
+def lagged_design(X, lags):
+    """
+    Stack lagged copies of the weekly features plus an intercept.
+
+    X: (weeks, plants, features) -> (weeks, plants, 1 + len(lags) * features)
+    Lag k uses the features from k weeks earlier; the first k weeks are NaN.
+    """
+    blocks = [np.ones(X.shape[:2] + (1,))]
+    for lag in lags:
+        blocks.append(_shift(X, lag))
+    return np.concatenate(blocks, axis=2)
+
+
+def autoregressive_design(Y, ar_lags=AR_LAGS):
+    """
+    Lagged copies of the targets, one column per lag.
+
+    Y: (weeks, plants, targets) -> (weeks, plants, targets, len(ar_lags))
+    """
+    assert all(lag >= 1 for lag in ar_lags), "autoregressive lags must be >= 1"
+    if len(ar_lags) == 0:
+        return np.empty(Y.shape + (0,))
+    return np.stack([_shift(Y, lag) for lag in ar_lags], axis=3)
+
+
+def _scores(err, actual):
+    """Absolute, squared and relative errors behind MAE / RMSE / MAPE."""
+    return err.abs(), err ** 2, (err.abs() / actual.abs()).replace(np.inf, np.nan)
+
+
+def backtest(panel, targets=TARGETS, features=FEATURES, lag_configs=LAG_CONFIGS,
+             ar_lags=AR_LAGS, horizon=0, warmup=8, forgetting=0.98, delta=1e4):
+    """
+    Rolling-origin backtest of RLS nowcasts for every plant, target and lag
+    configuration.
+
+    At week t each model predicts y[t + horizon] from the features known at t
+    (lagged wastewater/weather features and the targets `ar_lags` weeks before
+    t), then learns from the pair that has just become observable
+    (features at t - horizon, target at t). Predictions made before a model
+    has seen `warmup` weeks are not scored. The naive baseline predicts
+    y[t + horizon] = y[t - 1], the last week known at t.
+
+    Returns:
+        predictions: DataFrame (plant, target, lags, week, actual, predicted, naive)
+        summary: DataFrame of MAE / RMSE / MAPE / n per plant, target and lags,
+            with the naive baseline's naive_MAE / naive_RMSE / naive_MAPE on the same weeks
+    """
+    weeks, X, Y = weekly_panel(panel, features, list(targets))
+    n_weeks, n_plants, _ = X.shape
+
+    designs = [lagged_design(X, lags) for lags in lag_configs]
+    k = max(d.shape[2] for d in designs)
+    # pad every configuration to k columns; zero columns never move in RLS
+    padded = [np.pad(d, ((0, 0), (0, 0), (0, k - d.shape[2]))) for d in designs]
+    ar = autoregressive_design(Y, ar_lags)                                 # (weeks, plants, targets, ar)
+
+    combos = list(itertools.product(range(len(lag_configs)), range(n_plants), range(len(targets))))
+    D = np.stack([np.concatenate((padded[c][:, p, :], ar[:, p, t]), axis=1)
+                  for c, p, t in combos], axis=1)                          # (weeks, models, k + ar)
+    T = np.stack([Y[:, p, t] for _, p, t in combos], axis=1)              # (weeks, models)
+    naive = _shift(T, 1 + horizon)
+
+    model = RecursiveLeastSquares(len(combos), D.shape[2], forgetting=forgetting, delta=delta)
+    preds = np.full((n_weeks, len(combos)), np.nan)
+    for t in range(n_weeks):
+        if t + horizon < n_weeks:
+            ready = model.n_updates >= warmup
+            preds[t + horizon] = np.where(ready, model.predict(np.nan_to_num(D[t])), np.nan)
+            preds[t + horizon] = np.where(np.isfinite(D[t]).all(axis=1), preds[t + horizon], np.nan)
+        if t - horizon >= 0:
+            model.update(D[t - horizon], T[t])
+
+    labels = pd.DataFrame([(panel.plants[p], targets[tg], lag_configs[c]) for c, p, tg in combos],
+                          columns=["plant", "target", "lags"])
+    predictions = pd.DataFrame({
+        "model": np.tile(np.arange(len(combos)), n_weeks),
+        "week": np.repeat(weeks, len(combos)),
+        "actual": T.ravel(),
+        "predicted": preds.ravel(),
+        "naive": naive.ravel(),
+    })
+    predictions = labels.iloc[predictions["model"]].reset_index(drop=True).join(predictions.drop(columns="model"))
+    predictions = predictions.dropna(subset=["actual", "predicted", "naive"])
+
+    abs_err, sq_err, pct_err = _scores(predictions["predicted"] - predictions["actual"], predictions["actual"])
+    naive_abs, naive_sq, naive_pct = _scores(predictions["naive"] - predictions["actual"], predictions["actual"])
+    scored = predictions.assign(abs_err=abs_err, sq_err=sq_err, pct_err=pct_err,
+                                naive_abs=naive_abs, naive_sq=naive_sq, naive_pct=naive_pct)
+    summary = scored.groupby(["plant", "target", "lags"]).agg(
+        MAE=("abs_err", "mean"),
+        RMSE=("sq_err", lambda s: np.sqrt(s.mean())),
+        MAPE=("pct_err", "mean"),
+        naive_MAE=("naive_abs", "mean"),
+        naive_RMSE=("naive_sq", lambda s: np.sqrt(s.mean())),
+        naive_MAPE=("naive_pct", "mean"),
+        n=("abs_err", "size"),
+    ).reset_index()
+    return predictions, summary
+
+
+if __name__ == "__main__":
+    panel = build_panel()
+
+    start = time.perf_counter()
+    predictions, summary = backtest(panel)
+    elapsed = time.perf_counter() - start
+
+    print(summary.sort_values(["target", "plant", "RMSE"]).to_string(index=False))
+    print(f"\nBacktested {len(summary)} models over {predictions['week'].nunique()} weeks in {elapsed:.3f}s")
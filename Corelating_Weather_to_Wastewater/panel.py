@@ -0,0 +1,228 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from native_grid import MODES, native_samples, select_mode
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import MAX_GAP_DAYS, build_coverage
+
+'''
+Aligned multi-plant panel shared by the analyses.
+
+All sources (processed wastewater, daily weather, weekly COVID) are read once
+into one contiguous float array of shape (days x plants x variables) on a
+shared daily date axis, with a boolean mask marking which cells hold real
+data. Slicing by plant, variable (a single name, or names that sit next to
+each other on the variable axis) and date range returns numpy views, so
+correlation, smoothing and plotting code no longer re-joins DataFrames.
+Panel.frame also covers the native sampling modes of native_grid.align.
+
+Usage:
+    panel = build_panel()
+    wind = panel.sel(plant="Encina", variable="avg_wind_speed_m_s", start="2022-03-14")
+    matrix = panel.matrix("Mean viral gene copies/L")   # plants x days view for smoothing
+    df = panel.frame("Encina", ["zscore", "max_temp_c"], max_gap=14)   # skip long sampling gaps
+    native = panel.frame("Encina", ["zscore", "max_temp_c"], mode="native")   # real sample dates only
+'''
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PLANTS = {
+    "Encina": ("Encina_sewage_qPCR_Modified.csv", "weather_Encina.csv"),
+    "Point Loma": ("PointLoma_sewage_qPCR_Modified.csv", "weather_Point Loma.csv"),
+    "South Bay": ("SouthBay_sewage_qPCR_Modified.csv", "weather_South Bay.csv"),
+}
+
+WASTEWATER_VARS = ["Mean viral gene copies/L", "smoothed", "zscore"]
+WEATHER_VARS = ["max_temp_c", "min_temp_c", "avg_humidity_%", "avg_wind_speed_m_s"]
+COVID_VARS = ["Cases", "Hospitalization", "Deaths",
+              "Case Rate (per 100K)", "Hospitalization Rate (per 100K)", "Death Rate (per million)"]
+
+
+class Panel:
+    """
+    Days x plants x variables array with a shared date axis and a validity mask.
+
+    Attributes:
+        values: float64 array (days, plants, variables), NaN where missing
+        mask: bool array of the same shape, True where a value is present
+        dates: daily DatetimeIndex for axis 0
+        plants: plant names for axis 1
+        variables: variable names for axis 2
+        coverage: dict plant -> sampling_coverage.CoverageIndex of the real qPCR sample dates
+    """
+
+    def __init__(self, values, mask, dates, plants, variables, coverage=None):
+        assert values.shape == mask.shape, "values and mask must have the same shape"
+        assert values.shape == (len(dates), len(plants), len(variables)), "axis labels do not match values"
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.mask = np.ascontiguousarray(mask, dtype=bool)
+        self.dates = pd.DatetimeIndex(dates)
+        self.plants = list(plants)
+        self.variables = list(variables)
+        self._plant_pos = {p: i for i, p in enumerate(self.plants)}
+        self._var_pos = {v: i for i, v in enumerate(self.variables)}
+        self.coverage = coverage or {}
+
+    def __repr__(self):
+        return (f"Panel({len(self.dates)} days {self.dates[0].date()}..{self.dates[-1].date()}, "
+                f"plants={self.plants}, variables={self.variables})")
+
+    def _date_slice(self, start=None, end=None):
+        """Date range (inclusive) -> slice on axis 0, found by binary search."""
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        return slice(lo, hi)
+
+    def _key(self, names, positions):
+        """
+        Single name -> int (view), names at consecutive positions -> slice
+        (view), any other list of names -> int array, None -> all.
+        """
+        if names is None:
+            return slice(None)
+        if isinstance(names, str):
+            assert names in positions, f"unknown label '{names}'"
+            return positions[names]
+        for name in names:
+            assert name in positions, f"unknown label '{name}'"
+        index = np.array([positions[name] for name in names], dtype=np.int64)
+        if len(index) > 0 and np.all(np.diff(index) == 1):
+            return slice(int(index[0]), int(index[-1]) + 1)
+        return index
+
+    def sel(self, plant=None, variable=None, start=None, end=None, with_mask=False):
+        """
+        Slice the panel. Single plant/variable names, lists of names that are
+        adjacent on their axis (e.g. WEATHER_VARS) and a date range give a
+        numpy view; other lists of names fall back to a (small) copy.
+        """
+        index = (self._date_slice(start, end),
+                 self._key(plant, self._plant_pos),
+                 self._key(variable, self._var_pos))
+        if isinstance(index[1], np.ndarray) and isinstance(index[2], np.ndarray):
+            index = (index[0], index[1][:, None], index[2][None, :])
+        if with_mask:
+            return self.values[index], self.mask[index]
+        return self.values[index]
+
+    def date_index(self, start=None, end=None):
+        """Dates matching sel(start=..., end=...)."""
+        return self.dates[self._date_slice(start, end)]
+
+    def matrix(self, variable, start=None, end=None):
+        """Plants x days view of one variable (the layout smoothing.py works on)."""
+        return self.sel(variable=variable, start=start, end=end).T
+
+    def gap_mask(self, max_gap=MAX_GAP_DAYS, start=None, end=None):
+        """Days x plants, True where a day lies in a sampling gap longer than `max_gap` days."""
+        dates = self.date_index(start, end)
+        return np.stack([self.coverage[plant].in_gap(dates, max_gap) for plant in self.plants], axis=1)
+
+    def window_mask(self, width=7, k=1, start=None, end=None):
+        """Days x plants, True where the trailing `width` days hold at least `k` real samples."""
+        dates = self.date_index(start, end)
+        return np.stack([self.coverage[plant].windows_with(dates, width, k) for plant in self.plants], axis=1)
+
+    def frame(self, plant, variables=None, start=None, end=None, dropna=True, max_gap=None,
+              mode="interpolated", window=7):
+        """
+        DataFrame for one plant indexed by date. Rows where any of the selected
+        variables is missing are dropped unless dropna=False. With `max_gap`,
+        wastewater values inside sampling gaps longer than `max_gap` days are
+        treated as missing.
+
+        `mode` is applied by native_grid.select_mode: "native" keeps only the
+        plant's real sample dates (from its coverage index) with the same
+        day's weather, "native_window" also replaces the weather by its mean
+        over the trailing `window` days.
+        """
+        assert mode in MODES, f"mode must be one of {MODES}"
+        variables = self.variables if variables is None else list(variables)
+        dates = self.date_index(start, end)
+        # sel may return a view of the panel; the frame gets its own copy
+        df = pd.DataFrame(self.sel(plant=plant, variable=variables, start=start, end=end),
+                          index=dates, columns=variables, copy=True)
+        ww = [v for v in variables if v in WASTEWATER_VARS]
+        if max_gap is not None and ww:
+            df.loc[self.coverage[plant].in_gap(dates, max_gap), ww] = np.nan
+        weather = [v for v in variables if v not in WASTEWATER_VARS]
+        df = select_mode(df, self.coverage[plant].dates, weather, mode=mode, window=window)
+        if dropna:
+            df = df.dropna()
+        return df
+
+
+def _read_wastewater(path):
+    df = pd.read_csv(path)
+    df["Sample_Date"] = pd.to_datetime(df["Sample_Date"])
+    return df.set_index("Sample_Date").sort_index()
+
+
+def _read_weather(path):
+    df = pd.read_csv(path)
+    df["date"] = pd.to_datetime(df["date"])
+    df = df.set_index("date")
+    df.index = df.index.tz_localize(None).normalize()
+    return df.sort_index()
+
+
+def _read_covid(path):
+    df = pd.read_csv(path)
+    df["WkEndActual"] = pd.to_datetime(df["WkEndActual"])
+    return df.set_index("WkEndActual").sort_index()
+
+
+def _place(values, dates, plant_pos, var_offset, frame, columns):
+    """Copy `columns` of a date-indexed frame into the panel array."""
+    pos = dates.get_indexer(frame.index)
+    ok = pos >= 0
+    block = frame[columns].to_numpy(dtype=np.float64)[ok]
+    values[pos[ok], plant_pos, var_offset:var_offset + len(columns)] = block
+
+
+def build_panel(project_dir=PROJECT_DIR, plants=PLANTS, native=False,
+                covid_path="Covid_Data/COVID_weekly_processed_w_rates_ALL_YEARS.csv"):
+    """
+    Read the processed wastewater, weather and COVID files once into a Panel.
+
+    Args:
+        project_dir: repository root
+        plants: dict plant -> (wastewater csv in Wastewater_Data, weather csv in Weather_Data)
+        native: keep only real qPCR sample days for the wastewater variables
+            (interpolated days become missing, see native_grid.native_samples)
+            The real sample days also give each plant's coverage index.
+        covid_path: county-wide weekly COVID file (relative to project_dir),
+            placed on each week's WkEndActual for every plant; None to skip
+    Returns:
+        Panel covering the union of all source dates
+    """
+    wastewater = {}
+    samples = {}
+    weather = {}
+    for plant, (ww_file, weather_file) in plants.items():
+        ww = _read_wastewater(os.path.join(project_dir, "Wastewater_Data", ww_file))
+        samples[plant] = native_samples(ww)
+        wastewater[plant] = samples[plant] if native else ww
+        weather[plant] = _read_weather(os.path.join(project_dir, "Weather_Data", weather_file))
+
+    covid = _read_covid(os.path.join(project_dir, covid_path)) if covid_path else None
+
+    sources = list(wastewater.values()) + list(weather.values()) + ([covid] if covid is not None else [])
+    start = min(df.index.min() for df in sources)
+    end = max(df.index.max() for df in sources)
+    dates = pd.date_range(start, end, freq="D")
+
+    variables = WASTEWATER_VARS + WEATHER_VARS + (COVID_VARS if covid is not None else [])
+    values = np.full((len(dates), len(plants), len(variables)), np.nan)
+
+    for p, plant in enumerate(plants):
+        _place(values, dates, p, 0, wastewater[plant], WASTEWATER_VARS)
+        _place(values, dates, p, len(WASTEWATER_VARS), weather[plant], WEATHER_VARS)
+        if covid is not None:
+            _place(values, dates, p, len(WASTEWATER_VARS) + len(WEATHER_VARS), covid, COVID_VARS)
+
+    return Panel(values, ~np.isnan(values), dates, list(plants), variables, coverage=build_coverage(samples))
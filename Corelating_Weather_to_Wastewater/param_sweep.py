@@ -0,0 +1,293 @@
+import os
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+from scipy.stats import kendalltau, rankdata, t as t_dist
+
+from panel import WEATHER_VARS, build_panel
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Wastewater_Data'))
+from sampling_coverage import MAX_GAP_DAYS
+from smoothing import box, smooth
+
+'''
+Parallel parameter sweep over the analysis settings that the scripts hardcode:
+the smoothing of the wastewater signal (smooth_signal's 7-day roll), the
+trailing window of weekly_correlation, the 0..21 day delays and the
+"2022-03-14" start cutoff of the wind analysis, the weather variable and the
+correlation method.
+
+The aligned days x plants x variables array is copied into
+multiprocessing.shared_memory once. Workers attach to it by name and receive
+only (start, stop) ranges of configuration numbers; a configuration is decoded
+from its number with np.unravel_index over the grid's option lists, and each
+worker writes r / p-value / n straight into a shared result buffer. The
+parent turns that buffer into one columnar DataFrame (categorical parameter
+columns), so neither inputs nor results are pickled.
+
+Usage:
+    grid = default_grid()
+    grid["window"] = [1, 3, 7, 14, 28]
+    table = sweep(build_inputs(), grid, processes=4)
+'''
+
+TARGET = "Mean viral gene copies/L"
+X_VARS = WEATHER_VARS + ["avg_temp_c"]
+METHODS = ("pearson", "spearman", "kendall")
+
+# grid keys in decode order: the outer keys change slowest, so consecutive
+# configurations share the cached smoothed series
+GRID_KEYS = ["plant", "x", "smoothing", "window", "start", "lag", "method"]
+
+RESULT_COLUMNS = ["r", "p_value", "n"]
+
+
+def default_grid(plants=("Point Loma", "Encina", "South Bay")):
+    """
+    Grid that covers the values hardcoded in the scripts.
+
+    smoothing is a list of (kernel, width) for smoothing.smooth, or None for the
+    unsmoothed daily series; window is the trailing mean length in days
+    (1 = no weekly averaging); start is the first date of the x series.
+    """
+    return {
+        "plant": list(plants),
+        "x": list(X_VARS),
+        "smoothing": [None, ("box", 7)],
+        "window": [1, 7],
+        "start": ["2022-03-14"],
+        "lag": list(range(22)),
+        "method": list(METHODS),
+    }
+
+
+def build_inputs(panel=None, max_gap=MAX_GAP_DAYS):
+    """
+    Daily (days x plants x variables) array of the target and X_VARS.
+
+    Like the wind analysis, target days inside sampling gaps longer than
+    `max_gap` days are set to NaN (None keeps every interpolated day).
+
+    Returns:
+        values: float64 array, variables ordered [TARGET] + X_VARS
+        dates: DatetimeIndex of axis 0
+        plants: plant names of axis 1
+    """
+    panel = build_panel(covid_path=None) if panel is None else panel
+    values = panel.sel(variable=[TARGET] + WEATHER_VARS).copy()
+    if max_gap is not None:
+        values[:, :, 0][panel.gap_mask(max_gap)] = np.nan
+    min_t = values[:, :, 1 + WEATHER_VARS.index("min_temp_c")]
+    max_t = values[:, :, 1 + WEATHER_VARS.index("max_temp_c")]
+    values = np.concatenate((values, ((min_t + max_t) / 2)[:, :, None]), axis=2)
+    return np.ascontiguousarray(values), panel.dates, panel.plants
+
+
+def _pearson(a, b):
+    a = a - a.mean()
+    b = b - b.mean()
+    denom = np.sqrt((a @ a) * (b @ b))
+    return (a @ b) / denom if denom > 0 else np.nan
+
+
+def _p_value(r, n):
+    """Two-sided p-value of a correlation coefficient (t distribution, n - 2 dof)."""
+    if n < 3 or not np.isfinite(r):
+        return np.nan
+    if abs(r) >= 1.0:
+        return 0.0
+    t = r * np.sqrt((n - 2) / (1.0 - r * r))
+    return 2.0 * t_dist.sf(abs(t), n - 2)
+
+
+def correlate(a, b, method):
+    """(r, p, n) of two aligned 1-D arrays, using only positions where both are finite."""
+    ok = np.isfinite(a) & np.isfinite(b)
+    a, b = a[ok], b[ok]
+    n = len(a)
+    if n < 3:
+        return np.nan, np.nan, n
+    if method == "kendall":
+        tau, p = kendalltau(a, b)
+        return tau, p, n
+    if method == "spearman":
+        a, b = rankdata(a), rankdata(b)
+    r = _pearson(a, b)
+    return r, _p_value(r, n), n
+
+
+# worker state, set by _attach in every process
+_state = {}
+
+
+def _attach(input_name, input_shape, result_name, n_configs, options, plant_pos, start_pos):
+    """Pool initializer: map the shared input and result buffers."""
+    input_shm = SharedMemory(name=input_name)
+    result_shm = SharedMemory(name=result_name)
+    _state.update(
+        input_shm=input_shm,
+        result_shm=result_shm,
+        values=np.ndarray(input_shape, dtype=np.float64, buffer=input_shm.buf),
+        results=np.ndarray((n_configs, len(RESULT_COLUMNS)), dtype=np.float64, buffer=result_shm.buf),
+        options=options,
+        shape=tuple(len(options[k]) for k in GRID_KEYS),
+        plant_pos=plant_pos,
+        start_pos=start_pos,
+    )
+    _series.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def _series(plant, variable, smoothing, window):
+    """One plant's daily series after smoothing (target only) and the trailing window mean."""
+    values = _state["values"][:, _state["plant_pos"][plant], variable]
+    if smoothing is not None:
+        values = smooth(values, smoothing[0], smoothing[1])[0]
+    if window > 1:
+        values = box(values, window, center=False)[0]
+    return values
+
+
+def _run_chunk(bounds):
+    """Evaluate configurations lo..hi-1 and write them into the shared result buffer."""
+    lo, hi = bounds
+    options = _state["options"]
+    codes = np.unravel_index(np.arange(lo, hi), _state["shape"])
+    results = _state["results"]
+    n_days = _state["values"].shape[0]
+
+    for row, idx in enumerate(zip(*codes), start=lo):
+        config = {k: options[k][i] for k, i in zip(GRID_KEYS, idx)}
+        plant, lag = config["plant"], config["lag"]
+        y = _series(plant, 0, config["smoothing"], config["window"])
+        x = _series(plant, 1 + X_VARS.index(config["x"]), None, config["window"])
+
+        # x on day t (t >= start) against the target `lag` days later
+        first = _state["start_pos"][idx[GRID_KEYS.index("start")]]
+        last = n_days - lag
+        if last <= first:
+            results[row] = (np.nan, np.nan, 0)
+            continue
+        results[row] = correlate(x[first:last], y[first + lag:last + lag], config["method"])
+    return hi - lo
+
+
+def _chunks(n_configs, chunk_size):
+    return [(lo, min(lo + chunk_size, n_configs)) for lo in range(0, n_configs, chunk_size)]
+
+
+def _options(grid):
+    """Option lists of every GRID_KEYS entry, with list options (e.g. ["box", 7]) as hashable tuples."""
+    return {k: [tuple(v) if isinstance(v, list) else v for v in grid[k]] for k in GRID_KEYS}
+
+
+def grid_size(grid):
+    return int(np.prod([len(grid[k]) for k in GRID_KEYS]))
+
+
+def grid_table(grid):
+    """Columnar (categorical) frame of every configuration, in configuration order."""
+    options = _options(grid)
+    shape = tuple(len(options[k]) for k in GRID_KEYS)
+    codes = np.unravel_index(np.arange(int(np.prod(shape))), shape)
+    columns = {}
+    for key, code in zip(GRID_KEYS, codes):
+        labels = ["none" if v is None else "_".join(map(str, v)) if isinstance(v, tuple) else v
+                  for v in options[key]]
+        if key in ("window", "lag"):
+            columns[key] = np.asarray(labels, dtype=np.int64)[code]
+        else:
+            columns[key] = pd.Categorical.from_codes(code, categories=pd.Index(labels, dtype=object))
+    return pd.DataFrame(columns)
+
+
+def sweep(inputs, grid, processes=None, chunk_size=512, progress=True):
+    """
+    Evaluate every configuration of `grid` over the shared input array.
+
+    Args:
+        inputs: (values, dates, plants) from build_inputs()
+        grid: dict with one option list per GRID_KEYS entry (see default_grid)
+        processes: worker processes (default os.cpu_count()); 0 runs in this process
+        chunk_size: configurations per task sent to a worker
+        progress: print completed/total while results stream in
+    Returns:
+        DataFrame with one row per configuration: the GRID_KEYS parameters
+        plus r, p_value and n
+    """
+    values, dates, plants = inputs
+    for key in GRID_KEYS:
+        assert key in grid and len(grid[key]) > 0, f"grid needs a non-empty '{key}' list"
+    for method in grid["method"]:
+        assert method in METHODS, f"method must be one of {METHODS}"
+    for x in grid["x"]:
+        assert x in X_VARS, f"x must be one of {X_VARS}"
+
+    n_configs = grid_size(grid)
+    options = _options(grid)
+    plant_pos = {p: i for i, p in enumerate(plants)}
+    for plant in options["plant"]:
+        assert plant in plant_pos, f"unknown plant '{plant}'"
+    start_pos = [int(dates.searchsorted(pd.Timestamp(s))) for s in options["start"]]
+
+    input_shm = SharedMemory(create=True, size=values.nbytes)
+    result_shm = SharedMemory(create=True, size=max(n_configs * len(RESULT_COLUMNS) * 8, 1))
+    try:
+        np.ndarray(values.shape, dtype=np.float64, buffer=input_shm.buf)[:] = values
+        results = np.ndarray((n_configs, len(RESULT_COLUMNS)), dtype=np.float64, buffer=result_shm.buf)
+        results[:] = np.nan
+
+        init_args = (input_shm.name, values.shape, result_shm.name, n_configs, options, plant_pos, start_pos)
+        chunks = _chunks(n_configs, chunk_size)
+        done = 0
+        began = time.perf_counter()
+        if processes == 0:
+            _attach(*init_args)
+            completed = map(_run_chunk, chunks)
+        else:
+            pool = Pool(processes or os.cpu_count(), initializer=_attach, initargs=init_args)
+            completed = pool.imap_unordered(_run_chunk, chunks)
+        try:
+            for count in completed:
+                done += count
+                if progress:
+                    print(f"\r{done}/{n_configs} configurations "
+                          f"({done / max(time.perf_counter() - began, 1e-9):.0f}/s)", end="", flush=True)
+        finally:
+            if processes != 0:
+                pool.close()
+                pool.join()
+        if progress:
+            print()
+
+        table = grid_table(options)
+        for j, column in enumerate(RESULT_COLUMNS):
+            table[column] = results[:, j].copy()
+        table["n"] = table["n"].fillna(0).astype(np.int64)
+    finally:
+        _state.clear()
+        for shm in (input_shm, result_shm):
+            shm.close()
+            shm.unlink()
+    return table
+
+
+if __name__ == "__main__":
+    grid = default_grid()
+    grid["smoothing"] = [None, ("box", 3), ("box", 7), ("box", 14), ("ewma", 7), ("savgol", 15)]
+    grid["window"] = [1, 3, 7, 14, 21, 28]
+    grid["start"] = ["2022-01-01", "2022-03-14", "2022-06-01", "2023-01-01"]
+
+    inputs = build_inputs()
+    start = time.perf_counter()
+    table = sweep(inputs, grid)
+    elapsed = time.perf_counter() - start
+    print(f"{len(table)} configurations in {elapsed:.1f}s")
+
+    best = table[table["method"] == "pearson"].sort_values("r", key=np.abs, ascending=False)
+    print(best.groupby(["plant", "x"], observed=True).head(1).to_string(index=False))
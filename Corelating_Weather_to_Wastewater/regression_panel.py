@@ -0,0 +1,162 @@
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+'''
+Batched least-squares fits for many (x, y) pairs at once.
+
+Pairs (plants x weather variables x lags x polynomial degrees) are stacked into
+one padded array with a NaN mask and solved together with the normal
+equations, so a whole panel of trend lines costs a few array operations
+instead of one np.polyfit call per plot. The result is a single table; plots
+read their line from it with predict().
+'''
+
+
+def stack_pairs(pairs):
+    """
+    Stack (x, y) pairs of different lengths into padded 2-D arrays.
+
+    Args:
+        pairs: list of (key, x, y) where key is a dict of labels for the pair
+    Returns:
+        keys: DataFrame with one row of labels per pair
+        X, Y: float arrays of shape (n_pairs, max_len), NaN-padded
+        mask: bool array, True where both x and y are finite
+    """
+    assert len(pairs) > 0, "no pairs to fit"
+
+    max_len = max(len(x) for _, x, _ in pairs)
+    X = np.full((len(pairs), max_len), np.nan)
+    Y = np.full((len(pairs), max_len), np.nan)
+    for i, (_, x, y) in enumerate(pairs):
+        assert len(x) == len(y), "x and y must have the same length"
+        X[i, :len(x)] = np.asarray(x, dtype=np.float64)
+        Y[i, :len(y)] = np.asarray(y, dtype=np.float64)
+
+    mask = np.isfinite(X) & np.isfinite(Y)
+    keys = pd.DataFrame([key for key, _, _ in pairs])
+    return keys, X, Y, mask
+
+
+def fit_stacked(X, Y, mask, degree=1):
+    """
+    Solve polynomial least squares for every row of X, Y at once.
+
+    Masked-out points get zero weight, so each row is fitted on its own valid
+    samples only. x is centered per row before building the design matrix to
+    keep the normal equations well conditioned; coefficients are mapped back
+    to the raw x basis.
+
+    Returns:
+        coefs: (n_pairs, degree + 1), highest power first (np.polyfit order)
+        stats: dict of per-row arrays: n, r2, r, rmse, resid_std
+    """
+    w = mask.astype(np.float64)
+    n = w.sum(axis=1)
+    Xz = np.where(mask, X, 0.0)
+    Yz = np.where(mask, Y, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = Xz.sum(axis=1) / n
+        y_mean = Yz.sum(axis=1) / n
+    xc = np.where(mask, X - x_mean[:, None], 0.0)
+
+    # design matrix (pairs, points, powers) in ascending powers of centered x
+    powers = np.arange(degree + 1)
+    V = xc[:, :, None] ** powers * w[:, :, None]
+    XtX = np.einsum("bnp,bnq->bpq", V, V)
+    Xty = np.einsum("bnp,bn->bp", V, Yz)
+    beta_c = np.einsum("bpq,bq->bp", np.linalg.pinv(XtX), Xty)
+
+    fitted = np.einsum("bnp,bp->bn", V, beta_c)
+    resid = np.where(mask, Yz - fitted, 0.0)
+    ss_res = (resid ** 2).sum(axis=1)
+    ss_tot = (np.where(mask, Y - y_mean[:, None], 0.0) ** 2).sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, 0.0)
+        rmse = np.sqrt(ss_res / n)
+        resid_std = np.sqrt(ss_res / (n - degree - 1))
+        sxy = (xc * np.where(mask, Y - y_mean[:, None], 0.0)).sum(axis=1)
+        sxx = (xc ** 2).sum(axis=1)
+        r = sxy / np.sqrt(sxx * ss_tot)
+
+    # expand sum_k b_k (x - m)^k back into raw powers of x
+    coefs = np.zeros_like(beta_c)
+    for k in range(degree + 1):
+        for j in range(k + 1):
+            coefs[:, j] += beta_c[:, k] * comb(k, j) * (-x_mean) ** (k - j)
+    coefs = coefs[:, ::-1]
+
+    fit_ok = n > degree
+    coefs[~fit_ok] = np.nan
+    stats = {"n": n.astype(int), "r2": r2, "r": r, "rmse": rmse, "resid_std": resid_std}
+    for name in ("r2", "r", "rmse", "resid_std"):
+        stats[name] = np.where(fit_ok, stats[name], np.nan)
+    return coefs, stats
+
+
+def fit_panel(pairs, degrees=(1,)):
+    """
+    Fit every pair for every polynomial degree and return one table.
+
+    Args:
+        pairs: list of (key, x, y); key is a dict of labels, e.g.
+            {"plant": "Encina", "x": "max_temp_c", "y": "zscore", "lag": 0}
+        degrees: polynomial degrees to fit
+    Returns:
+        DataFrame with the key columns plus degree, n, coefs (highest power
+        first), slope (coefficient of x), intercept, r2, r, rmse, resid_std
+    """
+    keys, X, Y, mask = stack_pairs(pairs)
+
+    tables = []
+    for degree in degrees:
+        coefs, stats = fit_stacked(X, Y, mask, degree=degree)
+        table = keys.copy()
+        table["degree"] = degree
+        table["n"] = stats["n"]
+        table["coefs"] = [tuple(c) for c in coefs]
+        table["slope"] = coefs[:, -2] if degree >= 1 else np.nan
+        table["intercept"] = coefs[:, -1]
+        table["r2"] = stats["r2"]
+        table["r"] = stats["r"]
+        table["rmse"] = stats["rmse"]
+        table["resid_std"] = stats["resid_std"]
+        tables.append(table)
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def lagged_pairs(df, x_columns, y_column, lags=(0,), key=None):
+    """
+    Build (key, x, y) pairs for each weather column and lag from one frame.
+
+    A lag of k pairs y[t] with x[t - k] (weather leading wastewater by k rows).
+    """
+    key = key or {}
+    y_all = df[y_column].to_numpy(dtype=np.float64)
+    pairs = []
+    for x_column in x_columns:
+        x_all = df[x_column].to_numpy(dtype=np.float64)
+        for lag in lags:
+            x = x_all[:len(x_all) - lag] if lag > 0 else x_all
+            y = y_all[lag:]
+            pairs.append(({**key, "x": x_column, "y": y_column, "lag": lag}, x, y))
+    return pairs
+
+
+def select_fit(table, degree=1, **labels):
+    """Return the single table row matching the given labels and degree."""
+    rows = table[table["degree"] == degree]
+    for name, value in labels.items():
+        rows = rows[rows[name] == value]
+    assert len(rows) == 1, f"expected one fit for {labels}, found {len(rows)}"
+    return rows.iloc[0]
+
+
+def predict(fit, x):
+    """Evaluate a fitted row (from fit_panel) at x."""
+    return np.polyval(np.asarray(fit["coefs"]), x)
@@ -1,6 +1,11 @@
+import os
+import sys
 from pathlib import Path
 import pandas as pd
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corelating_Weather_to_Wastewater'))
+from artifacts import get_store
+
 
 DATA_DIR = Path("Data_wrangling")
 FY_LABEL = "2023-24"
@@ -80,11 +85,13 @@ def interpolate_missing(df, columns):
 
 def main():
     frames = []
+    inputs = []
     for metric, filename in FILES.items():
         path = DATA_DIR / filename
         if not path.exists():
             raise FileNotFoundError(f"Missing file: {path}")
         frames.append(prepare_metric(path, metric))
+        inputs.append(path)
 
     merged = frames[0]
     for frame in frames[1:]:
@@ -119,7 +126,9 @@ def main():
     # Rates stay as floats (they can have decimal values like 31.2 per 100K)
     
     merged = merged.sort_values("WkEndActual").reset_index(drop=True)
-    merged.to_csv(OUTPUT_PATH, index=False)
+    # stored once in Output/ (skipped when unchanged) and linked at OUTPUT_PATH
+    get_store().save_csv(merged, OUTPUT_PATH.name, links=[OUTPUT_PATH], inputs=inputs,
+                         params={"FY": FY_LABEL}, index=False)
 
     print(f"Processed data saved to {OUTPUT_PATH}")
     print(merged.head())
@@ -159,7 +168,7 @@ def merge_all_years():
     merged = merged.sort_values(["FY", "WkEndActual"]).reset_index(drop=True)
     
     output_file = DATA_DIR / "COVID_weekly_processed_ALL_YEARS.csv"
-    merged.to_csv(output_file, index=False)
+    get_store().save_csv(merged, output_file.name, links=[output_file], inputs=files, index=False)
     
     print(f"\nMerged file saved to: {output_file}")
     print(f"Total rows: {len(merged)}")
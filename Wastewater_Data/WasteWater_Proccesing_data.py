@@ -1,6 +1,15 @@
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corelating_Weather_to_Wastewater'))
+from artifacts import get_store
+from sampling_coverage import MAX_GAP_DAYS, CoverageIndex
+from smoothing import smooth
+
 def load_wastewater(csv_path):
     df = pd.read_csv(csv_path)
     df['Sample_Date'] = pd.to_datetime(df['Sample_Date'])
@@ -9,12 +18,24 @@ def load_wastewater(csv_path):
     return df
 
 
-def interpolate_daily(df):
+def interpolate_daily(df, max_gap=None):
+    """
+    Linearly interpolate the samples onto a daily grid. With `max_gap`, days
+    inside a gap of more than `max_gap` days between samples stay NaN.
+    """
     df_daily = df.resample('D').interpolate(method='linear')
+    if max_gap is not None:
+        coverage = CoverageIndex(df.dropna(how='all').index)
+        df_daily[coverage.in_gap(df_daily.index, max_gap)] = np.nan
     return df_daily
 
-def smooth_signal(df_daily):
-    df_daily['smoothed'] = df_daily.iloc[:, 0].rolling(7, center=True).mean()
+def smooth_signal(df_daily, kernel='box', width=7, **kwargs):
+    """
+    Smooth the first column into 'smoothed'. The default is the centered
+    7-day mean; any kernel from smoothing.KERNELS can be used instead.
+    """
+    values = df_daily.iloc[:, 0].to_numpy(dtype=float)
+    df_daily['smoothed'] = smooth(values, kernel, width, **kwargs)[0]
     return df_daily
 
 def normalize(df_daily):
@@ -22,16 +43,16 @@ def normalize(df_daily):
     df_daily['zscore'] = (df_daily[col] - df_daily[col].mean()) / df_daily[col].std()
     return df_daily
 
-def process_wastewater(csv_path):
+def process_wastewater(csv_path, max_gap=MAX_GAP_DAYS):
     """
     Steps performed:
     - Load CSV 
-    - Convert to daily data 
+    - Convert to daily data (gaps longer than `max_gap` days are left empty)
     - Smooth data with 7-day rolling average
     - Add z-score 
     """
     df = load_wastewater(csv_path)
-    df_daily = interpolate_daily(df)
+    df_daily = interpolate_daily(df, max_gap=max_gap)
     df_daily = smooth_signal(df_daily)
     df_daily = normalize(df_daily)
     return df_daily
@@ -52,7 +73,10 @@ if __name__ == "__main__":
     file_path = "SouthBay_sewage_qPCR.csv"
     df_processed = process_wastewater(file_path)
 
-    df_processed.to_csv("SouthBay_sewage_qPCR_Modified.csv")
+    # stored once in Output/ (skipped when unchanged) and linked here
+    get_store().save_csv(df_processed, "SouthBay_sewage_qPCR_Modified.csv",
+                         links=["SouthBay_sewage_qPCR_Modified.csv"], inputs=[file_path],
+                         params={"max_gap": MAX_GAP_DAYS})
 
     print(df_processed)
     plot_data(df_processed)
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+'''
+Gap and coverage index for sparse qPCR sampling.
+
+A CoverageIndex keeps one plant's real sample dates as a sorted array of day
+numbers. Because the array is sorted, the number of samples in any date range
+is the difference of two binary searches, so "where does date X start",
+"how many samples fall in [a, b]" and "which of these windows hold at least
+k samples" cost O(log n) per query and never rescan the frame. Gap runs
+(stretches between consecutive samples) come from the same array.
+
+Usage:
+    cov = CoverageIndex(raw_df.index)
+    cov.position("2022-03-14")                      # first sample on/after the date
+    cov.window_counts(daily_dates, width=7)         # real samples per trailing week
+    long_gap = cov.in_gap(daily_dates, max_gap=14)  # days interpolated across > 14 days
+'''
+
+# gaps longer than this (in days between two real samples) are not interpolated across
+MAX_GAP_DAYS = 14
+
+
+def _days(dates):
+    """Dates (anything pd.to_datetime accepts) -> int64 day numbers."""
+    dates = pd.DatetimeIndex(pd.to_datetime(np.atleast_1d(dates)))
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+    return dates.values.astype("datetime64[D]").astype(np.int64)
+
+
+class CoverageIndex:
+    """
+    Sorted sample dates of one plant with their gaps.
+
+    Attributes:
+        days: sorted unique sample dates as int64 day numbers
+        gaps: days between consecutive samples (len(days) - 1)
+    """
+
+    def __init__(self, sample_dates):
+        self.days = np.unique(_days(sample_dates))
+        self.gaps = np.diff(self.days)
+
+    def __len__(self):
+        return len(self.days)
+
+    def __repr__(self):
+        if len(self.days) == 0:
+            return "CoverageIndex(empty)"
+        first, last = self.dates[[0, -1]]
+        return (f"CoverageIndex({len(self.days)} samples {first.date()}..{last.date()}, "
+                f"longest gap {self.gaps.max() if len(self.gaps) else 0} days)")
+
+    @property
+    def dates(self):
+        return pd.DatetimeIndex(self.days.astype("datetime64[D]"))
+
+    def position(self, date, side="left"):
+        """Index of the first sample on/after `date` (side="right": strictly after)."""
+        return int(np.searchsorted(self.days, _days(date)[0], side=side))
+
+    def count(self, start=None, end=None):
+        """Number of samples in [start, end] (inclusive, open ends allowed)."""
+        lo = 0 if start is None else self.position(start, "left")
+        hi = len(self.days) if end is None else self.position(end, "right")
+        return max(hi - lo, 0)
+
+    def window_counts(self, ends, width=7):
+        """
+        Samples in each trailing window (end - width, end], vectorized over
+        an array of window end dates.
+        """
+        ends = _days(ends)
+        return (np.searchsorted(self.days, ends, side="right")
+                - np.searchsorted(self.days, ends - width, side="right"))
+
+    def windows_with(self, ends, width=7, k=1):
+        """Boolean per window end: does (end - width, end] hold at least k samples."""
+        return self.window_counts(ends, width) >= k
+
+    def gap_length(self, dates):
+        """
+        Length of the sampling gap each date falls in: 0 on a sample day, the
+        distance between the surrounding samples otherwise, inf outside the
+        sampled range.
+        """
+        days = _days(dates)
+        out = np.full(len(days), np.inf)
+        if len(self.days) == 0:
+            return out
+        i = np.searchsorted(self.days, days, side="right")
+        on_sample = (i > 0) & (self.days[np.clip(i - 1, 0, None)] == days)
+        inside = (i > 0) & (i < len(self.days))
+        out[inside] = self.gaps[i[inside] - 1]
+        out[on_sample] = 0.0
+        return out
+
+    def in_gap(self, dates, max_gap=MAX_GAP_DAYS):
+        """True for dates inside a gap longer than `max_gap` days (or outside the sampled range)."""
+        return self.gap_length(dates) > max_gap
+
+    def gap_runs(self, min_length=MAX_GAP_DAYS):
+        """
+        Gaps longer than `min_length` days.
+
+        Returns:
+            DataFrame with the last sample before the gap ('start'), the next
+            sample ('end') and the gap length in days
+        """
+        long_gaps = np.flatnonzero(self.gaps > min_length)
+        return pd.DataFrame({
+            "start": self.dates[long_gaps],
+            "end": self.dates[long_gaps + 1],
+            "length_days": self.gaps[long_gaps],
+        })
+
+
+def build_coverage(frames):
+    """CoverageIndex per plant from a dict plant -> frame indexed by sample date."""
+    return {plant: CoverageIndex(df.index) for plant, df in frames.items()}
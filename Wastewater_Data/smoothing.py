@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+'''
+Smoothing kernels for a plants x days matrix.
+
+Every kernel smooths all rows (plants) of a 2-D array at once along the last
+axis (days) and is NaN-aware: missing days get zero weight, and an output is
+NaN only when its window holds fewer than `min_periods` real values. Kernels:
+
+- "box":     trailing or centered moving average (cumulative sums)
+- "ewma":    exponentially weighted mean (IIR filter over values and weights)
+- "savgol":  Savitzky-Golay, local polynomial with flat weights
+- "loess":   local polynomial with tricube weights (no robustness iterations)
+
+Usage:
+    matrix, dates, plants = to_matrix(frames, "Mean viral gene copies/L")
+    smoothed = smooth(matrix, "savgol", width=15, degree=2)
+    results = sweep(matrix, [("box", 7), ("ewma", 14), ("loess", 21)])
+'''
+
+
+def to_matrix(frames, column):
+    """
+    Stack one column of several daily frames into a plants x days matrix.
+
+    Args:
+        frames: dict plant -> DataFrame indexed by date (e.g. process_wastewater output)
+        column: column to stack
+    Returns:
+        matrix (n_plants, n_days) with NaN where a plant has no value,
+        the shared daily DatetimeIndex and the list of plant names
+    """
+    start = min(df.index.min() for df in frames.values())
+    end = max(df.index.max() for df in frames.values())
+    dates = pd.date_range(start, end, freq="D")
+
+    matrix = np.full((len(frames), len(dates)), np.nan)
+    for i, df in enumerate(frames.values()):
+        pos = dates.get_indexer(df.index)
+        ok = pos >= 0
+        matrix[i, pos[ok]] = df[column].to_numpy(dtype=np.float64)[ok]
+    return matrix, dates, list(frames.keys())
+
+
+def _window_offsets(width, center):
+    """First and last offset of the window relative to the output day (pandas convention)."""
+    if center:
+        lo = -(width // 2)
+    else:
+        lo = -(width - 1)
+    return lo, lo + width - 1
+
+
+def _windows(a, lo, hi):
+    """Zero-padded sliding windows of `a` along the last axis: (..., days, width)."""
+    pad = [(0, 0)] * (a.ndim - 1) + [(-lo, hi)]
+    return sliding_window_view(np.pad(a, pad), hi - lo + 1, axis=-1)
+
+
+def box(matrix, width=7, center=True, min_periods=None):
+    """
+    Moving average over `width` days using cumulative sums.
+
+    min_periods defaults to `width`, which matches pandas rolling(width).
+    """
+    x = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    min_periods = width if min_periods is None else min_periods
+    mask = ~np.isnan(x)
+    n = x.shape[-1]
+
+    zeros = np.zeros(x.shape[:-1] + (1,))
+    csum = np.concatenate((zeros, np.cumsum(np.where(mask, x, 0.0), axis=-1)), axis=-1)
+    ccount = np.concatenate((zeros, np.cumsum(mask, axis=-1)), axis=-1)
+
+    lo, hi = _window_offsets(width, center)
+    idx = np.arange(n)
+    start = np.clip(idx + lo, 0, n)
+    end = np.clip(idx + hi + 1, 0, n)
+
+    sums = csum[..., end] - csum[..., start]
+    counts = ccount[..., end] - ccount[..., start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = sums / counts
+    return np.where(counts >= max(min_periods, 1), out, np.nan)
+
+
+def ewma(matrix, span=7, min_periods=1):
+    """
+    Exponentially weighted mean with alpha = 2 / (span + 1).
+
+    Values and weights are run through the same IIR filter and divided, which
+    equals pandas ewm(span=span).mean() (adjust=True) while letting missing
+    days drop out of both sums.
+    """
+    x = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    alpha = 2.0 / (span + 1.0)
+    mask = ~np.isnan(x)
+
+    b, a = [1.0], [1.0, -(1.0 - alpha)]
+    num = lfilter(b, a, np.where(mask, x, 0.0), axis=-1)
+    den = lfilter(b, a, mask.astype(np.float64), axis=-1)
+    counts = np.cumsum(mask, axis=-1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = num / den
+    return np.where((counts >= max(min_periods, 1)) & (den > 0), out, np.nan)
+
+
+def _local_polynomial(x, width, degree, weights, center, min_periods):
+    """
+    Weighted local polynomial fit evaluated at the output day.
+
+    The window moments sum(w * u^k) and sum(w * y * u^k) are computed for all
+    plants and days at once from sliding windows; each day then solves a small
+    (degree + 1) system and keeps the constant term.
+    """
+    mask = ~np.isnan(x)
+    lo, hi = _window_offsets(width, center)
+    u = np.arange(lo, hi + 1) / max(abs(lo), abs(hi), 1)
+    K = weights(u)
+
+    w_win = _windows(mask.astype(np.float64), lo, hi) * K
+    y_win = _windows(np.where(mask, x, 0.0), lo, hi)
+
+    powers = u[:, None] ** np.arange(2 * degree + 1)
+    M = w_win @ powers
+    B = (w_win * y_win) @ powers[:, :degree + 1]
+
+    k = np.arange(degree + 1)
+    A = M[..., k[:, None] + k[None, :]]
+    counts = _windows(mask.astype(np.float64), lo, hi).sum(axis=-1)
+    ok = counts >= max(min_periods, degree + 1)
+
+    A = np.where(ok[..., None, None], A, np.eye(degree + 1))
+    B = np.where(ok[..., None], B, 0.0)
+    with np.errstate(invalid="ignore"):
+        coef = np.linalg.solve(A, B[..., None])[..., 0]
+    return np.where(ok, coef[..., 0], np.nan)
+
+
+def savgol(matrix, width=15, degree=2, center=True, min_periods=None):
+    """
+    Savitzky-Golay smoothing: flat-weight local polynomial of `degree`.
+
+    Missing days are left out of each fit, so gaps and edges shrink the
+    window instead of poisoning it.
+    """
+    x = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    min_periods = degree + 1 if min_periods is None else min_periods
+    return _local_polynomial(x, width, degree, np.ones_like, center, min_periods)
+
+
+def loess(matrix, width=21, degree=1, center=True, min_periods=None):
+    """LOESS smoothing: local polynomial of `degree` with tricube weights."""
+    x = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    min_periods = degree + 1 if min_periods is None else min_periods
+    reach = 1.0 + 1.0 / max(width // 2, 1)
+
+    def tricube(u):
+        return (1 - np.abs(u / reach) ** 3) ** 3
+
+    return _local_polynomial(x, width, degree, tricube, center, min_periods)
+
+
+KERNELS = {
+    "box": box,
+    "ewma": lambda matrix, width, **kwargs: ewma(matrix, span=width, **kwargs),
+    "savgol": savgol,
+    "loess": loess,
+}
+
+
+def smooth(matrix, kernel="box", width=7, **kwargs):
+    """Smooth a plants x days matrix with one of KERNELS."""
+    assert kernel in KERNELS, f"kernel must be one of {list(KERNELS)}"
+    return KERNELS[kernel](matrix, width=width, **kwargs)
+
+
+def sweep(matrix, configs):
+    """
+    Run several (kernel, width[, kwargs]) configurations on the same matrix.
+
+    Returns a dict config -> smoothed matrix; the input is converted once.
+    """
+    x = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    results = {}
+    for config in configs:
+        kernel, width = config[0], config[1]
+        kwargs = config[2] if len(config) > 2 else {}
+        results[(kernel, width) + tuple(sorted(kwargs.items()))] = smooth(x, kernel, width, **kwargs)
+    return results
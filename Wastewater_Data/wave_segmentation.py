@@ -0,0 +1,293 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import find_peaks
+
+from WasteWater_Proccesing_data import load_wastewater
+
+'''
+Automatic pandemic-wave segmentation of the processed wastewater series.
+
+Waves are found on the smoothed (log) signal either with peak finding or with
+changepoint detection (PELT or binary segmentation, Gaussian mean-shift cost
+from cumulative sums). Changepoints only give level plateaus, so the plateaus
+are merged into rising-and-falling waves, trough to trough, before they are
+returned as an interval table:
+
+    plant | wave | start | end | peak_date | peak_value
+
+Labels for any other dated table come from an interval join (assign_waves)
+instead of a per-row if/elif function.
+'''
+
+PLANT_FILES = {
+    "Encina": "Encina_sewage_qPCR_Modified.csv",
+    "Point Loma": "PointLoma_sewage_qPCR_Modified.csv",
+    "South Bay": "SouthBay_sewage_qPCR_Modified.csv",
+}
+
+
+def _prepare_signal(df_daily, column, log):
+    """
+    Return the daily dates, the raw values and the (optionally log10) signal of
+    a column, from its first to its last valid day. Missing days stay NaN so
+    positions are days.
+    """
+    series = df_daily[column]
+    series = series.loc[series.first_valid_index():series.last_valid_index()].asfreq("D")
+    raw = series.to_numpy(dtype=np.float64)
+    values = np.log10(np.clip(raw, 1.0, None)) if log else raw
+    return series.index, raw, values
+
+
+def _finite_runs(values):
+    """(start, stop) positions of the runs of consecutive non-NaN values."""
+    finite = np.concatenate(([False], np.isfinite(values), [False]))
+    edges = np.flatnonzero(np.diff(finite.astype(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+def _segment_cost(csum, csum_sq, starts, end):
+    """Gaussian mean-shift cost of x[starts:end] for an array of start positions."""
+    n = end - starts
+    s = csum[end] - csum[starts]
+    s2 = csum_sq[end] - csum_sq[starts]
+    return s2 - s * s / n
+
+
+def pelt(values, penalty=None, min_size=14):
+    """
+    Pruned Exact Linear Time changepoint search for shifts in the mean.
+
+    Segment costs come from cumulative sums so each one is O(1); candidates
+    that can no longer be optimal are pruned, which keeps the search close to
+    linear on wave-shaped data. The default penalty is BIC-like and scaled to
+    the signal (variance * log n).
+
+    Returns sorted changepoint positions (indices where a new segment starts).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if n < 2 * min_size:
+        return np.array([], dtype=np.int64)
+    if penalty is None:
+        penalty = np.var(x) * np.log(n)
+
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+
+    for t in range(min_size, n + 1):
+        cand = candidates[t - candidates >= min_size]
+        if len(cand) == 0:
+            continue
+        totals = F[cand] + _segment_cost(csum, csum_sq, cand, t) + penalty
+        best = np.argmin(totals)
+        F[t] = totals[best]
+        last[t] = cand[best]
+        # prune candidates that can never beat the current optimum
+        keep = totals - penalty <= F[t]
+        candidates = np.concatenate((candidates[t - candidates < min_size], cand[keep], [t]))
+
+    bkps = []
+    t = n
+    while t > 0:
+        t = last[t]
+        if t > 0:
+            bkps.append(t)
+    return np.array(sorted(bkps), dtype=np.int64)
+
+
+def binary_segmentation(values, penalty=None, n_bkps=None, min_size=14):
+    """
+    Binary segmentation for shifts in the mean.
+
+    Every split search scores all split points of a segment at once from
+    cumulative sums, so one level of recursion is O(n) and the whole search
+    O(n log n). Stops after `n_bkps` changepoints, or when the best split no
+    longer reduces the cost by more than `penalty`.
+
+    Returns sorted changepoint positions (indices where a new segment starts).
+    """
+    x = np.asarray(values, dtype=np.float64)
+    n = len(x)
+    if penalty is None and n_bkps is None:
+        penalty = np.var(x) * np.log(max(n, 2))
+
+    csum = np.concatenate(([0.0], np.cumsum(x)))
+    csum_sq = np.concatenate(([0.0], np.cumsum(x * x)))
+
+    def best_split(a, b):
+        splits = np.arange(a + min_size, b - min_size + 1)
+        if len(splits) == 0:
+            return None, 0.0
+        whole = _segment_cost(csum, csum_sq, np.array([a]), b)[0]
+        left = _segment_cost(csum, csum_sq, np.full(len(splits), a), splits)
+        right = (csum_sq[b] - csum_sq[splits]) - (csum[b] - csum[splits]) ** 2 / (b - splits)
+        gains = whole - left - right
+        i = np.argmax(gains)
+        return splits[i], gains[i]
+
+    segments = [(0, n)]
+    bkps = []
+    while n_bkps is None or len(bkps) < n_bkps:
+        scored = [(best_split(a, b), (a, b)) for a, b in segments]
+        scored = [(split, gain, seg) for (split, gain), seg in scored if split is not None]
+        if not scored:
+            break
+        split, gain, (a, b) = max(scored, key=lambda item: item[1])
+        if penalty is not None and gain <= penalty:
+            break
+        bkps.append(split)
+        segments.remove((a, b))
+        segments.extend([(a, split), (split, b)])
+    return np.array(sorted(bkps), dtype=np.int64)
+
+
+def detect_peaks(values, prominence=0.3, distance=60):
+    """
+    Vectorized peak finding on a smoothed signal (scipy.signal.find_peaks).
+
+    `prominence` is in the units of `values` (log10 copies/L by default in
+    segment_waves, so 0.3 is roughly a 2x rise) and `distance` is the minimum
+    number of days between two peaks.
+
+    Returns peak positions and the trough positions that bound each peak.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    peaks, props = find_peaks(x, prominence=prominence, distance=distance)
+    return peaks, props["left_bases"], props["right_bases"]
+
+
+def _trough_bounds(x, peaks, left, right):
+    """
+    Wave start/end positions (end inclusive) around each peak.
+
+    Neighbouring waves share a trough; the intervals are cut at the lowest
+    point of `x` between two peaks so they do not overlap.
+    """
+    starts = np.asarray(left, dtype=np.int64).copy()
+    ends = np.asarray(right, dtype=np.int64).copy()
+    for i in range(1, len(peaks)):
+        trough = peaks[i - 1] + np.argmin(x[peaks[i - 1]:peaks[i] + 1])
+        ends[i - 1] = min(ends[i - 1], trough - 1)
+        starts[i] = max(starts[i], trough)
+    return starts, ends
+
+
+def segment_levels(values, bkps):
+    """Piecewise-constant signal: every changepoint segment replaced by its mean."""
+    x = np.asarray(values, dtype=np.float64)
+    bounds = np.concatenate(([0], bkps, [len(x)])).astype(np.int64)
+    means = np.add.reduceat(x, bounds[:-1]) / np.diff(bounds)
+    return np.repeat(means, np.diff(bounds))
+
+
+def _interval_table(dates, values, starts, ends, plant):
+    """Build the wave interval table from start/end positions (end inclusive)."""
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if len(starts) == 0:
+        return pd.DataFrame(columns=["plant", "wave", "start", "end", "peak_date", "peak_value"])
+
+    peak_pos = np.array([a + np.argmax(values[a:b + 1]) for a, b in zip(starts, ends)])
+
+    return pd.DataFrame({
+        "plant": plant,
+        "wave": np.arange(1, len(starts) + 1),
+        "start": dates[starts],
+        "end": dates[ends],
+        "peak_date": dates[peak_pos],
+        "peak_value": values[peak_pos],
+    })
+
+
+def segment_waves(df_daily, plant, method="peaks", column="smoothed", log=True,
+                  penalty=None, min_size=14, prominence=0.3, distance=60):
+    """
+    Segment one plant's processed wastewater series into waves.
+
+    method:
+    - "peaks": one wave per prominent peak, bounded by the troughs around it
+    - "pelt" / "binseg": changepoint segments merged into waves; a wave is a
+      run of rising levels up to a peak level and falling levels after it,
+      kept when the peak level rises `prominence` above the surrounding
+      troughs (the same rule as "peaks", applied to the segment means)
+
+    Returns the wave interval table (peak_value in the original units of `column`).
+    """
+    assert column in df_daily.columns, f"'{column}' column does not exist"
+    if method not in ("peaks", "pelt", "binseg"):
+        raise ValueError(f"Unknown method: {method}")
+    dates, raw, x = _prepare_signal(df_daily, column, log)
+
+    # every run of days between NaN gaps is segmented on its own, so the
+    # detectors never bridge a gap and positions stay in days
+    starts, ends = [], []
+    for a, b in zip(*_finite_runs(x)):
+        run = x[a:b]
+        if method == "peaks":
+            peaks, left, right = detect_peaks(run, prominence=prominence, distance=distance)
+        else:
+            if method == "pelt":
+                bkps = pelt(run, penalty=penalty, min_size=min_size)
+            else:
+                bkps = binary_segmentation(run, penalty=penalty, min_size=min_size)
+            # peaks of the level signal are the plateaus higher than both
+            # neighbours; their bases are the trough plateaus that bound the wave
+            peaks, left, right = detect_peaks(segment_levels(run, bkps), prominence=prominence, distance=distance)
+        run_starts, run_ends = _trough_bounds(run, peaks, left, right)
+        starts.append(run_starts + a)
+        ends.append(run_ends + a)
+
+    starts = np.concatenate(starts) if starts else []
+    ends = np.concatenate(ends) if ends else []
+    return _interval_table(dates, raw, starts, ends, plant)
+
+
+def segment_all_plants(data_dir=".", method="peaks", **kwargs):
+    """
+    Run segment_waves on the processed daily series of every plant in PLANT_FILES
+    (process_wastewater output, so they are not processed again).
+    Returns one interval table covering all plants.
+    """
+    tables = []
+    for plant, filename in PLANT_FILES.items():
+        df_daily = load_wastewater(f"{data_dir}/{filename}")
+        tables.append(segment_waves(df_daily, plant, method=method, **kwargs))
+    return pd.concat(tables, ignore_index=True)
+
+
+def assign_waves(dates, waves, plant=None, label_col="wave"):
+    """
+    Label dates with the wave interval they fall into (interval join).
+
+    `waves` is any table with 'start', 'end' and `label_col` columns (e.g. the
+    output of segment_waves, or hand-written variant periods). Intervals must
+    not overlap. Dates outside every interval get NaN.
+    """
+    if plant is not None:
+        waves = waves[waves["plant"] == plant]
+    waves = waves.sort_values("start")
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+    if len(waves) == 0:
+        return pd.Series(np.full(len(dates), np.nan, dtype=object), index=dates, name=label_col)
+
+    starts = pd.DatetimeIndex(waves["start"]).as_unit("ns").asi8
+    ends = pd.DatetimeIndex(waves["end"]).as_unit("ns").asi8
+    labels = waves[label_col].to_numpy()
+
+    pos = np.searchsorted(starts, dates.as_unit("ns").asi8, side="right") - 1
+    inside = (pos >= 0) & (dates.as_unit("ns").asi8 <= ends[np.clip(pos, 0, None)])
+
+    out = np.full(len(dates), np.nan, dtype=object)
+    out[inside] = labels[pos[inside]]
+    return pd.Series(out, index=dates, name=label_col)
+
+
+if __name__ == "__main__":
+    waves = segment_all_plants(".")
+    print(waves)
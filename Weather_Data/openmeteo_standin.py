@@ -0,0 +1,550 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import flatbuffers
+import numpy as np
+import pandas as pd
+import requests
+from openmeteo_sdk.Aggregation import Aggregation
+from openmeteo_sdk.Unit import Unit
+from openmeteo_sdk.Variable import Variable
+
+from weather_hourly import (ARCHIVE_URL, FORECAST_URL, HOURLY_VARS, fetch_hourly,
+                            hourly_to_daily, make_client)
+
+'''
+Local stand-in for the Open-Meteo forecast and archive APIs.
+
+Serves /v1/forecast and /v1/archive in JSON (default) or FlatBuffers
+(format=flatbuffers, what openmeteo_requests asks for), so the fetchers can be
+pointed at it with weather_hourly.endpoint(base_url=...) or the
+OPENMETEO_BASE_URL environment variable. Responses come from one of three
+sources:
+
+- "synthetic": deterministic diurnal/seasonal series per coordinate
+- "replay":    JSON recordings in a directory, keyed by the request parameters
+- "record":    proxy to the real API and store each new response for replay
+
+Latency, a random 500 error rate and a requests-per-second limit (429 with a
+JSON reason, like the real API) are configurable, which makes retry backoff,
+caching and client concurrency testable offline.
+
+Usage:
+    python openmeteo_standin.py serve --port 8765 --latency 0.05 --error-rate 0.1
+    OPENMETEO_BASE_URL=http://127.0.0.1:8765 python weather_data.py
+    python openmeteo_standin.py loadtest --requests 60 --concurrency 8 --rate-limit 20
+'''
+
+UPSTREAM = {"/v1/forecast": FORECAST_URL, "/v1/archive": ARCHIVE_URL}
+
+SOURCES = ("synthetic", "replay", "record")
+
+# variable prefix -> (openmeteo_sdk Variable, Unit, JSON unit label)
+VARIABLES = {
+    "temperature": (Variable.temperature, Unit.celsius, "°C"),
+    "relative_humidity": (Variable.relative_humidity, Unit.percentage, "%"),
+    "wind_speed": (Variable.wind_speed, Unit.kilometres_per_hour, "km/h"),
+}
+
+AGGREGATIONS = {"min": Aggregation.minimum, "max": Aggregation.maximum, "mean": Aggregation.mean}
+
+SECTIONS = ("hourly", "daily")
+
+
+def describe_variable(name: str) -> Tuple[int, int, str, int, int]:
+    """Split an API variable name like 'temperature_2m_max' into its FlatBuffers fields.
+
+    Returns:
+        (variable, unit, unit label, altitude in metres, aggregation); unknown
+        names map to Variable.undefined.
+    """
+
+    stem, aggregation = name, Aggregation.none
+    for suffix, code in AGGREGATIONS.items():
+        if name.endswith("_" + suffix):
+            stem, aggregation = name[:-len(suffix) - 1], code
+
+    altitude = 0
+    prefix = stem
+    head, _, tail = stem.rpartition("_")
+    if head and tail.endswith("m") and tail[:-1].isdigit():
+        prefix, altitude = head, int(tail[:-1])
+
+    variable, unit, label = VARIABLES.get(prefix, (Variable.undefined, Unit.undefined, ""))
+    return variable, unit, label, altitude, aggregation
+
+
+def _unix(times: pd.DatetimeIndex) -> np.ndarray:
+    """Unix seconds of a DatetimeIndex, whatever its resolution."""
+    return times.as_unit("s").asi8
+
+
+def _seed(lat: float, lon: float) -> int:
+    key = f"{round(lat, 3)},{round(lon, 3)}".encode()
+    return int.from_bytes(hashlib.sha1(key).digest()[:4], "little")
+
+
+def synthetic_hourly(lat: float, lon: float, times: pd.DatetimeIndex,
+                     variables: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Deterministic hourly series for one coordinate.
+
+    Temperature has a diurnal and a seasonal cycle plus smooth noise, humidity
+    moves against temperature and wind picks up in the afternoon. The same
+    coordinate and timestamp always give the same value, whatever range is
+    requested.
+    """
+
+    epoch_hours = _unix(times) // 3600
+    hour = (times.tz_convert("UTC").hour.to_numpy() + lon / 15.0) % 24   # local solar hour
+    doy = times.dayofyear.to_numpy()
+
+    # smooth noise: a fixed random walk indexed by absolute hour, so overlapping
+    # requests agree with each other
+    rng = np.random.default_rng(_seed(lat, lon))
+    phases = rng.uniform(0, 2 * np.pi, size=3)
+    noise = (np.sin(epoch_hours / 37.0 + phases[0]) + 0.5 * np.sin(epoch_hours / 11.0 + phases[1])
+             + 0.3 * np.sin(epoch_hours / 5.0 + phases[2]))
+
+    temperature = (17.0 - 0.02 * (lat - 32.7) * 100
+                   + 4.0 * np.sin(2 * np.pi * (hour - 9) / 24)
+                   + 5.0 * np.sin(2 * np.pi * (doy - 110) / 365.25)
+                   + 1.2 * noise)
+    humidity = np.clip(75.0 - 2.5 * (temperature - 17.0) + 4.0 * noise, 5.0, 100.0)
+    wind = np.clip(9.0 + 5.0 * np.sin(2 * np.pi * (hour - 10) / 24) + 2.5 * noise, 0.0, None)
+    series = {"temperature": temperature, "relative_humidity": humidity, "wind_speed": wind}
+
+    out = {}
+    for name in variables:
+        prefix = [p for p in series if name.startswith(p)]
+        values = series[prefix[0]] if prefix else np.zeros(len(times))
+        out[name] = values.astype(np.float32)
+    return out
+
+
+def _time_axis(params: Dict[str, str], tz: str) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """First local midnight and the local midnight after the last requested day."""
+
+    today = pd.Timestamp.now(tz=tz).normalize()
+    start = params.get("start_date")
+    end = params.get("end_date")
+    first = pd.Timestamp(start, tz=tz) if start else today - pd.Timedelta(days=int(params.get("past_days", 0)))
+    last = pd.Timestamp(end, tz=tz) if end else today + pd.Timedelta(days=int(params.get("forecast_days", 7)) - 1)
+    return first, last + pd.Timedelta(days=1)
+
+
+def synthetic_payload(params: Dict[str, str]) -> List[dict]:
+    """Build response payloads (one per coordinate) for the requested variables.
+
+    Payloads mirror the JSON API layout, but 'time' holds int64 unix seconds
+    and values are float32 arrays; `to_json` and `to_flatbuffers` render them.
+    """
+
+    lats = [float(v) for v in params["latitude"].split(",")]
+    lons = [float(v) for v in params["longitude"].split(",")]
+    assert len(lats) == len(lons), "latitude and longitude must have the same length"
+    tz = params.get("timezone", "GMT")
+    tz = "UTC" if tz in ("GMT", "auto") else tz
+    first, stop = _time_axis(params, tz)
+    assert first < stop, "end_date must not be before start_date"
+
+    hourly_vars = [v for v in params.get("hourly", "").split(",") if v]
+    daily_vars = [v for v in params.get("daily", "").split(",") if v]
+    hours = pd.date_range(first, stop, freq="h", inclusive="left").tz_convert("UTC")
+    days = pd.date_range(first, stop, freq="D", inclusive="left")
+
+    payloads = []
+    for lat, lon in zip(lats, lons):
+        payload = {
+            "latitude": lat,
+            "longitude": lon,
+            "elevation": 20.0,
+            "utc_offset_seconds": int(first.utcoffset().total_seconds()),
+            "timezone": tz,
+            "timezone_abbreviation": first.tzname(),
+        }
+        base = {v: v.rsplit("_", 1)[0] for v in daily_vars}
+        series = synthetic_hourly(lat, lon, hours, list(dict.fromkeys(hourly_vars + list(base.values()))))
+
+        if hourly_vars:
+            payload["hourly"] = {"time": _unix(hours), "interval": 3600,
+                                 "variables": {v: series[v] for v in hourly_vars}}
+        if daily_vars:
+            frame = pd.DataFrame({"time": hours, **series})
+            stats = {}
+            for v in daily_vars:
+                stats.setdefault(base[v], []).append(v.rsplit("_", 1)[1])
+            daily = hourly_to_daily(frame, stats, tz=tz)
+            payload["daily"] = {"time": _unix(days), "interval": 86400,
+                                "variables": {v: daily[v].to_numpy(dtype=np.float32) for v in daily_vars}}
+        payloads.append(payload)
+    return payloads
+
+
+def to_json(payloads: List[dict]) -> bytes:
+    """Render payloads the way the JSON API does (a list only for several coordinates)."""
+
+    docs = []
+    for payload in payloads:
+        offset = pd.Timedelta(seconds=payload["utc_offset_seconds"])
+        doc = {k: v for k, v in payload.items() if k not in SECTIONS}
+        doc["generationtime_ms"] = 0.1
+        for section in SECTIONS:
+            if section not in payload:
+                continue
+            block = payload[section]
+            fmt = "%Y-%m-%dT%H:%M" if section == "hourly" else "%Y-%m-%d"
+            times = (pd.to_datetime(block["time"], unit="s") + offset).strftime(fmt)
+            doc[f"{section}_units"] = {"time": "iso8601",
+                                       **{v: describe_variable(v)[2] for v in block["variables"]}}
+            doc[section] = {"time": list(times),
+                            **{v: [None if np.isnan(x) else round(float(x), 2) for x in values]
+                               for v, values in block["variables"].items()}}
+        docs.append(doc)
+    return json.dumps(docs[0] if len(docs) == 1 else docs).encode()
+
+
+def from_json(body: bytes) -> List[dict]:
+    """Parse a JSON API response (e.g. a recording) back into payloads."""
+
+    docs = json.loads(body)
+    docs = docs if isinstance(docs, list) else [docs]
+    payloads = []
+    for doc in docs:
+        offset = pd.Timedelta(seconds=doc.get("utc_offset_seconds", 0))
+        payload = {k: v for k, v in doc.items()
+                   if k not in SECTIONS and not k.endswith("_units") and k != "generationtime_ms"}
+        for section in SECTIONS:
+            if section not in doc:
+                continue
+            block = dict(doc[section])
+            times = pd.to_datetime(block.pop("time")) - offset
+            seconds = _unix(pd.DatetimeIndex(times))
+            payload[section] = {
+                "time": seconds,
+                "interval": int(seconds[1] - seconds[0]) if len(seconds) > 1 else 3600,
+                "variables": {v: np.array(values, dtype=np.float64).astype(np.float32)
+                              for v, values in block.items()},
+            }
+        payloads.append(payload)
+    return payloads
+
+
+def _build_section(builder: flatbuffers.Builder, block: dict) -> int:
+    """VariablesWithTime table for one hourly/daily block."""
+
+    offsets = []
+    for name, values in block["variables"].items():
+        variable, unit, _, altitude, aggregation = describe_variable(name)
+        vector = builder.CreateNumpyVector(np.ascontiguousarray(values, dtype=np.float32))
+        builder.StartObject(7)
+        builder.PrependUOffsetTRelativeSlot(3, vector, 0)
+        builder.PrependInt16Slot(5, altitude, 0)
+        builder.PrependUint8Slot(0, variable, 0)
+        builder.PrependUint8Slot(1, unit, 0)
+        builder.PrependUint8Slot(6, aggregation, 0)
+        offsets.append(builder.EndObject())
+
+    builder.StartVector(4, len(offsets), 4)
+    for offset in reversed(offsets):
+        builder.PrependUOffsetTRelative(offset)
+    variables = builder.EndVector()
+
+    times = block["time"]
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, int(times[0]) if len(times) else 0, 0)
+    builder.PrependInt64Slot(1, int(times[-1]) + block["interval"] if len(times) else 0, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables, 0)
+    builder.PrependInt32Slot(2, block["interval"], 0)
+    return builder.EndObject()
+
+
+def to_flatbuffers(payloads: List[dict]) -> bytes:
+    """Render payloads as size-prefixed WeatherApiResponse messages, one per coordinate."""
+
+    messages = []
+    for payload in payloads:
+        builder = flatbuffers.Builder(1024)
+        sections = {s: _build_section(builder, payload[s]) for s in SECTIONS if s in payload}
+        timezone = builder.CreateString(payload.get("timezone", "GMT"))
+        abbreviation = builder.CreateString(payload.get("timezone_abbreviation", "GMT"))
+
+        builder.StartObject(15)
+        builder.PrependFloat32Slot(0, payload["latitude"], 0)
+        builder.PrependFloat32Slot(1, payload["longitude"], 0)
+        builder.PrependFloat32Slot(2, payload.get("elevation", 0.0), 0)
+        builder.PrependFloat32Slot(3, 0.1, 0)
+        builder.PrependInt32Slot(6, payload.get("utc_offset_seconds", 0), 0)
+        builder.PrependUOffsetTRelativeSlot(7, timezone, 0)
+        builder.PrependUOffsetTRelativeSlot(8, abbreviation, 0)
+        if "daily" in sections:
+            builder.PrependUOffsetTRelativeSlot(10, sections["daily"], 0)
+        if "hourly" in sections:
+            builder.PrependUOffsetTRelativeSlot(11, sections["hourly"], 0)
+        builder.FinishSizePrefixed(builder.EndObject())
+        messages.append(bytes(builder.Output()))
+    return b"".join(messages)
+
+
+def normalize_params(query: str) -> Dict[str, str]:
+    """Query string -> flat dict; repeated keys (requests' list encoding) are comma-joined."""
+
+    return {k: ",".join(v) for k, v in parse_qs(query, keep_blank_values=True).items()}
+
+
+def recording_key(path: str, params: Dict[str, str]) -> str:
+    """Stable file name for a request, ignoring the response format."""
+
+    items = sorted((k, v) for k, v in params.items() if k != "format")
+    return hashlib.sha1(json.dumps([path, items]).encode()).hexdigest()
+
+
+class StandinServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server with the fault-injection settings and request counters.
+
+    Args:
+        address: (host, port); port 0 picks a free port
+        source: one of SOURCES
+        recordings: directory of recordings (replay/record)
+        latency: seconds added to every response
+        jitter: extra uniform random latency in [0, jitter] seconds
+        error_rate: probability of answering 500
+        rate_limit: requests per second before answering 429 (None = unlimited)
+        seed: seed of the fault-injection random generator
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 8765), source="synthetic", recordings=None,
+                 latency=0.0, jitter=0.0, error_rate=0.0, rate_limit=None, seed=0):
+        assert source in SOURCES, f"source must be one of {SOURCES}"
+        assert source == "synthetic" or recordings, "replay/record need a recordings directory"
+        assert 0.0 <= error_rate <= 1.0, "error_rate must be in [0, 1]"
+        super().__init__(address, StandinHandler)
+        self.source = source
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = float(rate_limit or 0)
+        self.refilled = time.monotonic()
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "bad_requests": 0}
+        if recordings:
+            os.makedirs(recordings, exist_ok=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> Optional[int]:
+        """Count the request and decide on an injected failure (429/500) or None."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.rate_limit:
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled) * self.rate_limit)
+                self.refilled = now
+                if self.tokens < 1.0:
+                    self.stats["rate_limited"] += 1
+                    return 429
+                self.tokens -= 1.0
+            if self.random.random() < self.error_rate:
+                self.stats["errors"] += 1
+                return 500
+            return None
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def payloads(self, path: str, params: Dict[str, str]) -> List[dict]:
+        """Response payloads for a request from the configured source."""
+        if self.source == "synthetic":
+            return synthetic_payload(params)
+
+        file_path = os.path.join(self.recordings, recording_key(path, params) + ".json")
+        if os.path.exists(file_path):
+            with open(file_path) as f:
+                return from_json(json.load(f)["body"].encode())
+        assert self.source == "record", f"no recording for {path} {params}"
+
+        upstream = {k: v for k, v in params.items() if k != "format"}
+        response = requests.get(UPSTREAM[path], params=upstream, timeout=60)
+        response.raise_for_status()
+        with open(file_path, "w") as f:
+            json.dump({"path": path, "params": upstream, "body": response.text}, f)
+        return from_json(response.content)
+
+    def start(self) -> threading.Thread:
+        """Serve from a background thread (for load tests and notebooks)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """GET/POST /v1/forecast and /v1/archive."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, reason, headers=None):
+        self._send(status, json.dumps({"error": True, "reason": reason}).encode(), headers=headers)
+
+    def _handle(self, query):
+        server = self.server
+        url = urlsplit(self.path)
+        delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+
+        if url.path not in UPSTREAM:
+            server.count("bad_requests")
+            return self._error(404, f"Unknown endpoint {url.path}")
+
+        failure = server.admit()
+        if failure == 429:
+            return self._error(429, "Minutely API request limit exceeded. Please try again in one minute.",
+                               headers={"Retry-After": "1"})
+        if failure == 500:
+            return self._error(500, "Injected server error")
+
+        params = normalize_params(query)
+        try:
+            assert "latitude" in params and "longitude" in params, "Parameter 'latitude' and 'longitude' required"
+            payloads = server.payloads(url.path, params)
+        except (AssertionError, ValueError) as e:
+            server.count("bad_requests")
+            return self._error(400, str(e))
+
+        server.count("ok")
+        if params.get("format") == "flatbuffers":
+            return self._send(200, to_flatbuffers(payloads), "application/octet-stream")
+        return self._send(200, to_json(payloads))
+
+    def do_GET(self):
+        self._handle(urlsplit(self.path).query)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._handle(self.rfile.read(length).decode())
+
+
+def load_test(base_url: str, locations: Dict[str, Tuple[float, float]], start: str, end: str,
+              n_requests: int = 30, concurrency: int = 4, variables: Sequence[str] = HOURLY_VARS,
+              kind: str = "archive", cache: bool = False, retries: int = 5,
+              backoff_factor: float = 0.1) -> pd.DataFrame:
+    """
+    Fire `n_requests` fetch_hourly calls from `concurrency` threads through one
+    cached+retry client and time each of them.
+
+    Returns:
+        DataFrame with one row per request: location, seconds, ok, rows, error
+    """
+    url = f"{base_url.rstrip('/')}/v1/{kind}"
+    names = list(locations)
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(os.path.join(tmp, "loadtest"), expire_after=3600 if cache else 0,
+                             retries=retries, backoff_factor=backoff_factor)
+
+        def one(i):
+            name = names[i % len(names)]
+            lat, lon = locations[name]
+            began = time.perf_counter()
+            try:
+                df = fetch_hourly(lat, lon, start, end, variables=variables, url=url, client=client)
+                return name, time.perf_counter() - began, True, len(df), ""
+            except Exception as e:
+                return name, time.perf_counter() - began, False, 0, str(e)[:120]
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            rows = list(pool.map(one, range(n_requests)))
+    return pd.DataFrame(rows, columns=["location", "seconds", "ok", "rows", "error"])
+
+
+def _server_from_args(parsed, port=None):
+    return StandinServer((parsed.host, parsed.port if port is None else port),
+                         source=parsed.source, recordings=parsed.recordings,
+                         latency=parsed.latency, jitter=parsed.jitter,
+                         error_rate=parsed.error_rate, rate_limit=parsed.rate_limit, seed=parsed.seed)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Local Open-Meteo stand-in server")
+    parser.add_argument("command", choices=["serve", "loadtest"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--source", choices=SOURCES, default="synthetic")
+    parser.add_argument("--recordings", default=None, help="Directory of recorded responses (replay/record)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 response")
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=30, help="loadtest: number of fetches")
+    parser.add_argument("--concurrency", type=int, default=4, help="loadtest: client threads")
+    parser.add_argument("--cache", action="store_true", help="loadtest: keep requests_cache enabled")
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--end", default="2024-03-31")
+    parsed = parser.parse_args(args=args)
+
+    if parsed.command == "serve":
+        server = _server_from_args(parsed)
+        print(f"Serving Open-Meteo stand-in ({parsed.source}) on {server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(server.stats)
+        return
+
+    server = _server_from_args(parsed, port=0)
+    server.start()
+    locations = {
+        "Encina": (32.69, -117.1611),
+        "Point Loma": (32.697, -117.236),
+        "South Bay": (32.592, -117.087),
+    }
+    began = time.perf_counter()
+    results = load_test(server.base_url, locations, parsed.start, parsed.end,
+                        n_requests=parsed.requests, concurrency=parsed.concurrency, cache=parsed.cache)
+    elapsed = time.perf_counter() - began
+    server.shutdown()
+
+    ok = results[results["ok"]]
+    print(f"{len(ok)}/{len(results)} fetches ok in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+    if len(ok):
+        print(f"latency p50={ok['seconds'].median():.3f}s p95={ok['seconds'].quantile(0.95):.3f}s")
+    print("server:", server.stats)
+    failed = results[~results["ok"]]
+    if len(failed):
+        print(failed["error"].value_counts().to_string())
+
+
+if __name__ == "__main__":
+    main()
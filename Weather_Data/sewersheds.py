@@ -0,0 +1,259 @@
+import hashlib
+import os
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely import STRtree
+
+'''
+Sewershed polygons, plant coordinates and a spatial index for assigning points to plants.
+
+Plant and weather coordinates live here instead of being typed into each
+script. Sewershed boundaries are read from a polygon file (GeoJSON, shapefile,
+...) with one or more polygons per plant; without a file, approximate
+sewersheds are built as Voronoi cells of the plant locations clipped to a
+boundary (e.g. the county outline).
+
+SewershedIndex wraps the polygons in a shapely STRtree, so a whole batch of
+points (weather grid cells, geocoded case addresses, stations) is assigned in
+one vectorized query. cached_assignment stores each assignment table as a CSV
+keyed by a hash of the polygons and the points, so fetch and aggregation
+stages reuse it instead of recomputing.
+
+Usage:
+    index = SewershedIndex(load_sewersheds("sewersheds.geojson", plant_col="name"))
+    plants = index.assign(lats, lons, nearest=True)
+    grid = cached_assignment(index, "weather_grid", *grid_points(index.bounds, 0.05))
+'''
+
+PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CACHE_DIR = os.path.join(PROJECT_DIR, "cache", "sewersheds")
+
+CRS = "EPSG:4326"
+
+# treatment plant (outfall) coordinates, (lat, lon)
+PLANT_LOCATIONS: Dict[str, Tuple[float, float]] = {
+    "Encina": (33.1387, -117.3258),
+    "Point Loma": (32.6840, -117.2400),
+    "South Bay": (32.5881, -117.0330),
+}
+
+# points the daily weather CSVs (weather_<plant>.csv) were fetched at, (lat, lon)
+WEATHER_LOCATIONS: Dict[str, Tuple[float, float]] = {
+    "Encina": (32.69, -117.1611),
+    "Point Loma": (32.697, -117.236),
+    "South Bay": (32.592, -117.087),
+}
+
+
+def plants_frame(locations: Dict[str, Tuple[float, float]] = PLANT_LOCATIONS) -> gpd.GeoDataFrame:
+    """GeoDataFrame of named points with a 'location' column (lon/lat point geometry)."""
+
+    lats = [lat for lat, _ in locations.values()]
+    lons = [lon for _, lon in locations.values()]
+    return gpd.GeoDataFrame({"location": list(locations.keys())},
+                            geometry=gpd.points_from_xy(lons, lats), crs=CRS)
+
+
+def county_boundary(query: str = "San Diego County, California, USA") -> gpd.GeoDataFrame:
+    """County outline geocoded through osmnx (cached by osmnx under ./cache)."""
+
+    import osmnx as ox
+
+    return ox.geocode_to_gdf(query).to_crs(CRS)
+
+
+def voronoi_sewersheds(locations: Dict[str, Tuple[float, float]] = PLANT_LOCATIONS,
+                       boundary: Optional[gpd.GeoDataFrame] = None) -> gpd.GeoDataFrame:
+    """Approximate sewersheds: Voronoi cells of the plant locations.
+
+    Every point is given to its closest plant, which is only a stand-in for
+    real service-area boundaries.
+
+    Args:
+        locations: Plant name -> (lat, lon).
+        boundary: Optional polygons to clip the cells to (e.g. `county_boundary()`).
+
+    Returns:
+        GeoDataFrame with columns ['plant', 'geometry'], one row per plant.
+    """
+
+    points = plants_frame(locations)
+    cells = shapely.voronoi_polygons(shapely.MultiPoint(list(points.geometry)),
+                                     extend_to=shapely.box(*points.total_bounds).buffer(2.0))
+    cells = gpd.GeoDataFrame(geometry=list(cells.geoms), crs=CRS)
+
+    # voronoi_polygons does not keep the input order; match cells back to plants
+    joined = gpd.sjoin(points, cells, predicate="within")
+    sheds = gpd.GeoDataFrame({"plant": joined["location"].to_numpy()},
+                             geometry=cells.geometry.iloc[joined["index_right"]].to_numpy(), crs=CRS)
+    if boundary is not None:
+        sheds["geometry"] = sheds.geometry.intersection(boundary.to_crs(CRS).union_all())
+    return sheds
+
+
+def load_sewersheds(path: Optional[str] = None, plant_col: str = "plant",
+                    boundary: Optional[gpd.GeoDataFrame] = None,
+                    locations: Dict[str, Tuple[float, float]] = PLANT_LOCATIONS) -> gpd.GeoDataFrame:
+    """Load sewershed polygons, one (multi)polygon per plant.
+
+    Args:
+        path: Polygon file readable by geopandas. None builds Voronoi
+            sewersheds from `locations` instead.
+        plant_col: Column of the file that holds the plant name.
+        boundary: Clip polygons for the Voronoi fallback.
+        locations: Plant locations for the Voronoi fallback.
+
+    Returns:
+        GeoDataFrame with columns ['plant', 'geometry'] in EPSG:4326.
+
+    Raises:
+        AssertionError: if `plant_col` is missing from the file.
+    """
+
+    if path is None:
+        return voronoi_sewersheds(locations, boundary)
+
+    gdf = gpd.read_file(path)
+    assert plant_col in gdf.columns, f"'{plant_col}' column does not exist"
+    if gdf.crs is None:
+        gdf = gdf.set_crs(CRS)
+    gdf = gdf.to_crs(CRS)[[plant_col, "geometry"]].rename(columns={plant_col: "plant"})
+    # several polygons per plant (service areas, islands) become one multipolygon
+    return gdf.dissolve(by="plant", as_index=False)
+
+
+class SewershedIndex:
+    """STRtree over sewershed polygons for batch point-in-polygon assignment.
+
+    Args:
+        sewersheds: GeoDataFrame with 'plant' and polygon geometry (see `load_sewersheds`).
+    """
+
+    def __init__(self, sewersheds: gpd.GeoDataFrame):
+        assert "plant" in sewersheds.columns, "'plant' column does not exist"
+        sewersheds = sewersheds.to_crs(CRS) if sewersheds.crs is not None else sewersheds
+        self.plants = np.asarray(sewersheds["plant"], dtype=object)
+        self.geometries = np.asarray(sewersheds.geometry)
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.bounds = tuple(shapely.total_bounds(self.geometries))
+
+    @property
+    def key(self) -> str:
+        """Hash of the plant names and polygons, used for cache file names."""
+
+        digest = hashlib.sha1()
+        for plant, geom in zip(self.plants, self.geometries):
+            digest.update(str(plant).encode())
+            digest.update(shapely.to_wkb(geom))
+        return digest.hexdigest()
+
+    def assign(self, lats: Sequence[float], lons: Sequence[float], nearest: bool = False,
+               max_distance: Optional[float] = None) -> np.ndarray:
+        """Plant of every point, found with one STRtree query for the whole batch.
+
+        Points on a shared border go to the first matching polygon.
+
+        Args:
+            lats: Latitudes (decimal degrees).
+            lons: Longitudes, same length as `lats`.
+            nearest: Give points outside every polygon to the closest one
+                (e.g. offshore grid cells or outfall coordinates).
+            max_distance: Limit for `nearest`, in degrees.
+
+        Returns:
+            Object array of plant names, None where a point is unassigned.
+        """
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        assert lats.shape == lons.shape, "lats and lons must have the same shape"
+        points = shapely.points(lons, lats)
+
+        # bounding-box candidates from the tree, then the exact test on the
+        # prepared polygons with intersects_xy (about 3x faster than
+        # query(points, predicate="intersects") on a million points)
+        point_idx, poly_idx = self.tree.query(points)
+        hit = shapely.intersects_xy(self.geometries[poly_idx], lons[point_idx], lats[point_idx])
+        point_idx, poly_idx = point_idx[hit], poly_idx[hit]
+        # keep the first matching polygon per point
+        first = np.unique(point_idx, return_index=True)[1]
+        owner = np.full(len(points), -1, dtype=np.int64)
+        owner[point_idx[first]] = poly_idx[first]
+
+        if nearest and (owner < 0).any():
+            missing = np.flatnonzero(owner < 0)
+            near_point, near_poly = self.tree.query_nearest(points[missing], max_distance=max_distance,
+                                                            all_matches=False)
+            owner[missing[near_point]] = near_poly
+
+        plants = np.full(len(points), None, dtype=object)
+        plants[owner >= 0] = self.plants[owner[owner >= 0]]
+        return plants
+
+    def assign_frame(self, df: pd.DataFrame, lat_col: str = "lat", lon_col: str = "lon",
+                     nearest: bool = False, out_col: str = "plant") -> pd.DataFrame:
+        """Copy of `df` with a plant column assigned from its coordinate columns."""
+
+        for col in (lat_col, lon_col):
+            assert col in df.columns, f"'{col}' column does not exist"
+        out = df.copy()
+        out[out_col] = self.assign(df[lat_col].to_numpy(), df[lon_col].to_numpy(), nearest=nearest)
+        return out
+
+
+def grid_points(bounds: Tuple[float, float, float, float], step: float = 0.05) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell centers of a regular lat/lon grid covering (minx, miny, maxx, maxy).
+
+    Returns:
+        (lats, lons) flat arrays, e.g. the weather grid to assign to sewersheds.
+    """
+
+    minx, miny, maxx, maxy = bounds
+    lons = np.arange(minx + step / 2, maxx, step)
+    lats = np.arange(miny + step / 2, maxy, step)
+    grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+    return grid_lat.ravel(), grid_lon.ravel()
+
+
+def cached_assignment(index: SewershedIndex, name: str, lats: Sequence[float], lons: Sequence[float],
+                      nearest: bool = False, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """Assignment table for a batch of points, read from / written to the cache.
+
+    The cache file is '<name>_<hash>.csv', where the hash covers the polygons,
+    the coordinates and `nearest`; any change gives a new file.
+
+    Returns:
+        DataFrame with columns ['lat', 'lon', 'plant'] in input order.
+    """
+
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    digest = hashlib.sha1(index.key.encode())
+    digest.update(lats.tobytes())
+    digest.update(lons.tobytes())
+    digest.update(b"nearest" if nearest else b"inside")
+    path = os.path.join(cache_dir, f"{name}_{digest.hexdigest()[:16]}.csv")
+
+    if os.path.exists(path):
+        table = pd.read_csv(path, dtype={"plant": object}, float_precision="round_trip")
+        table["plant"] = table["plant"].where(table["plant"].notna(), None)
+        return table
+
+    table = pd.DataFrame({"lat": lats, "lon": lons,
+                          "plant": pd.Series(index.assign(lats, lons, nearest=nearest), dtype=object)})
+    os.makedirs(cache_dir, exist_ok=True)
+    table.to_csv(path, index=False)
+    return table
+
+
+def grid_assignment(index: SewershedIndex, step: float = 0.05, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """Weather grid cells over the sewersheds with their plant (cached); cells outside are dropped."""
+
+    lats, lons = grid_points(index.bounds, step)
+    table = cached_assignment(index, f"grid_{step:g}", lats, lons, cache_dir=cache_dir)
+    return table[table["plant"].notna()].reset_index(drop=True)
@@ -0,0 +1,219 @@
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
+from matplotlib.widgets import RadioButtons, Slider
+
+'''Interactive weather dashboard that precomputes all frames and updates artists in place'''
+
+VARIABLES = ["temperature", "humidity", "wind_speed"]
+
+
+def precompute_frames(combined: pd.DataFrame, locations: Sequence[str],
+                      variables: Sequence[str] = VARIABLES):
+    """Pivot the long `combined` frame into a dense (time, location, variable) cube once.
+
+    Args:
+        combined: Long DataFrame with 'time', 'location' and one column per variable.
+        locations: Location order used for axis 1 (must match the station markers).
+        variables: Variable order used for axis 2.
+
+    Returns:
+        times: Sorted DatetimeIndex of all timestamps (axis 0).
+        cube: float array (n_times, n_locations, n_variables), NaN where missing.
+
+    Raises:
+        AssertionError: if a location or variable is missing from `combined`.
+    """
+
+    for var in variables:
+        assert var in combined.columns, f"'{var}' column does not exist"
+    assert set(locations) <= set(combined["location"]), "unknown location in locations"
+
+    times = pd.DatetimeIndex(sorted(pd.to_datetime(combined["time"]).unique()))
+    t_pos = times.get_indexer(pd.to_datetime(combined["time"]))
+    l_pos = pd.Index(list(locations)).get_indexer(combined["location"])
+    ok = l_pos >= 0
+
+    cube = np.full((len(times), len(locations), len(variables)), np.nan)
+    cube[t_pos[ok], l_pos[ok]] = combined.loc[ok, list(variables)].to_numpy(dtype=np.float64)
+    return times, cube
+
+
+# panel weather columns (daily CSVs) behind each hourly dashboard variable
+PANEL_VARIABLES = {
+    "temperature": ["max_temp_c", "min_temp_c"],
+    "humidity": ["avg_humidity_%"],
+    "wind_speed": ["avg_wind_speed_m_s"],
+}
+
+
+def precompute_correlations(panel, locations: Sequence[str], variables: Sequence[str] = VARIABLES,
+                            y_column: str = "zscore", max_gap: Optional[int] = None,
+                            mode: str = "interpolated") -> Dict[str, pd.DataFrame]:
+    """Wastewater vs weather correlations of every plant, computed once from the panel.
+
+    Args:
+        panel: Aligned panel from Corelating_Weather_to_Wastewater/panel.build_panel.
+        locations: Plant names (the dashboard stations).
+        variables: Dashboard variables, mapped to panel columns by PANEL_VARIABLES.
+        y_column: Wastewater column correlated with the weather.
+        max_gap: Leave out interpolated days inside sampling gaps longer than this.
+        mode: Panel sampling mode ("interpolated", "native" or "native_window").
+
+    Returns:
+        Mapping variable -> DataFrame (locations x panel columns) of Pearson r.
+
+    Raises:
+        AssertionError: if a variable has no panel columns.
+    """
+
+    for var in variables:
+        assert var in PANEL_VARIABLES, f"no panel columns for '{var}'"
+    columns = [col for var in variables for col in PANEL_VARIABLES[var]]
+
+    r = pd.DataFrame(np.nan, index=list(locations), columns=columns)
+    for loc in locations:
+        df = panel.frame(loc, [y_column, *columns], max_gap=max_gap, mode=mode, dropna=False)
+        r.loc[loc] = df[columns].corrwith(df[y_column])
+    return {var: r[PANEL_VARIABLES[var]] for var in variables}
+
+
+class WeatherDashboard:
+    """Map + time-series dashboard driven by precomputed arrays.
+
+    Scrubbing the time slider only changes the marker colors, value labels and
+    the time cursor; switching variable only swaps the line data and color
+    limits. The static parts (county outline, axes) are drawn once and cached
+    as a background so updates are blitted when the canvas supports it.
+
+    Args:
+        combined: Long DataFrame with 'time', 'location' and variable columns.
+        gdf: GeoDataFrame of stations with a 'location' column and point geometry.
+        county: GeoDataFrame of the county polygon(s).
+        variables: Variables offered by the dashboard.
+        correlations: Optional output of precompute_correlations, shown next to
+            the time series of the selected variable.
+    """
+
+    def __init__(self, combined: pd.DataFrame, gdf, county, variables: Sequence[str] = VARIABLES,
+                 correlations: Optional[Dict[str, pd.DataFrame]] = None):
+        self.locations: List[str] = list(gdf["location"])
+        self.variables: List[str] = list(variables)
+        self.times, self.cube = precompute_frames(combined, self.locations, self.variables)
+        self.correlations = correlations
+        self.norms = [Normalize(np.nanmin(self.cube[:, :, v]), np.nanmax(self.cube[:, :, v]))
+                      for v in range(len(self.variables))]
+        self.t_index = len(self.times) - 1
+        self.v_index = 0
+
+        self.fig = plt.figure(figsize=(14, 8))
+        self.ax_map = self.fig.add_axes([0.03, 0.15, 0.45, 0.8])
+        self.ax_ts = self.fig.add_axes([0.55, 0.35, 0.42, 0.6])
+
+        county.boundary.plot(ax=self.ax_map, edgecolor="black", linewidth=1.2)
+        xs = gdf.geometry.x.to_numpy()
+        ys = gdf.geometry.y.to_numpy()
+        self.scatter = self.ax_map.scatter(xs, ys, c=self.cube[self.t_index, :, 0], cmap="coolwarm",
+                                           norm=self.norms[0], s=200, edgecolors="black", zorder=3)
+        self.colorbar = self.fig.colorbar(self.scatter, ax=self.ax_map, shrink=0.7)
+        self.labels = [self.ax_map.text(x + 0.02, y + 0.02, "", fontsize=10) for x, y in zip(xs, ys)]
+        self.map_title = self.ax_map.set_title("")
+
+        self.lines = [self.ax_ts.plot(self.times, self.cube[:, i, 0], label=loc)[0]
+                      for i, loc in enumerate(self.locations)]
+        self.cursor = self.ax_ts.axvline(self.times[self.t_index], color="black", linestyle="--")
+        self.corr_text = self.ax_ts.text(0.01, 0.98, "", transform=self.ax_ts.transAxes,
+                                         fontsize=9, verticalalignment="top", family="monospace")
+        self.ax_ts.legend(loc="upper right")
+        self.ax_ts.grid(True, alpha=0.3)
+
+        self.dynamic = [self.scatter, self.map_title, self.cursor, *self.labels]
+        for artist in self.dynamic:
+            artist.set_animated(True)
+
+        self._background = None
+        self.fig.canvas.mpl_connect("draw_event", self._on_draw)
+        self.set_variable(self.variables[0])
+
+    def _on_draw(self, event) -> None:
+        """Cache the static background after every full redraw."""
+        canvas = self.fig.canvas
+        if hasattr(canvas, "copy_from_bbox"):
+            self._background = canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self.dynamic:
+            self.fig.draw_artist(artist)
+
+    def _blit(self) -> None:
+        """Redraw only the dynamic artists on top of the cached background."""
+        canvas = self.fig.canvas
+        if self._background is None or not getattr(canvas, "supports_blit", False):
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        for artist in self.dynamic:
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def set_time(self, t_index: int) -> None:
+        """Show timestamp number `t_index`: recolor markers, relabel, move the cursor."""
+
+        assert 0 <= t_index < len(self.times), "t_index out of range"
+        self.t_index = int(t_index)
+        values = self.cube[self.t_index, :, self.v_index]
+        self.scatter.set_array(values)
+        for label, loc, value in zip(self.labels, self.locations, values):
+            label.set_text(f"{loc}\n{value:.1f}")
+        timestamp = self.times[self.t_index]
+        self.cursor.set_xdata([timestamp, timestamp])
+        self.map_title.set_text(f"{self.variables[self.v_index].title()} at {timestamp}")
+        self._blit()
+
+    def set_variable(self, variable: str) -> None:
+        """Switch variable: swap line data and color limits (needs one full redraw)."""
+
+        assert variable in self.variables, f"variable must be one of {self.variables}"
+        self.v_index = self.variables.index(variable)
+        self.scatter.set_norm(self.norms[self.v_index])
+        for i, line in enumerate(self.lines):
+            line.set_ydata(self.cube[:, i, self.v_index])
+        self.ax_ts.set_ylim(self.norms[self.v_index].vmin, self.norms[self.v_index].vmax)
+        self.ax_ts.set_ylabel(variable)
+        if self.correlations is not None:
+            self.corr_text.set_text("wastewater r\n" + self.correlations[variable].round(2).to_string())
+        self.colorbar.update_normal(self.scatter)
+        self.fig.canvas.draw()
+        self.set_time(self.t_index)
+
+    def add_controls(self) -> None:
+        """Attach a matplotlib time slider and variable selector to the figure."""
+
+        ax_slider = self.fig.add_axes([0.55, 0.15, 0.42, 0.04])
+        ax_radio = self.fig.add_axes([0.55, 0.02, 0.15, 0.1])
+        self.slider = Slider(ax_slider, "Time", 0, len(self.times) - 1,
+                             valinit=self.t_index, valstep=1)
+        self.radio = RadioButtons(ax_radio, self.variables)
+        # the slider would otherwise call draw_idle (a full redraw) on every
+        # step; its moving parts are blitted with the other dynamic artists
+        self.slider.drawon = False
+        slider_artists = [self.slider.poly, getattr(self.slider, "_handle", None), self.slider.valtext]
+        for artist in slider_artists:
+            if artist is not None:
+                artist.set_animated(True)
+                self.dynamic.append(artist)
+        self.slider.on_changed(lambda val: self.set_time(int(val)))
+        self.radio.on_clicked(self.set_variable)
+
+    def save(self, output_path: str, t_index: Optional[int] = None) -> None:
+        """Render one timestamp to a PNG."""
+
+        if t_index is not None:
+            self.set_time(t_index)
+        for artist in self.dynamic:
+            artist.set_animated(False)
+        self.fig.savefig(output_path, dpi=150, bbox_inches="tight")
+        for artist in self.dynamic:
+            artist.set_animated(True)
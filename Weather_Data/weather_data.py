@@ -1,82 +1,101 @@
-import openmeteo_requests
+import os
+import sys
+
 import pandas as pd
-import requests_cache
-from retry_requests import retry
-from datetime import date 
+from datetime import date
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corelating_Weather_to_Wastewater'))
+from artifacts import get_store
+from sewersheds import WEATHER_LOCATIONS, SewershedIndex, grid_assignment, load_sewersheds
+from weather_hourly import LOCAL_TZ, endpoint, fetch_hourly_many, hourly_to_daily, make_client
 
-'''Parse and store weather data for 3 San Diego regions'''
+'''Parse and store weather data for 3 San Diego regions (averaged over each plant's sewershed when polygons are given)'''
 
 # --- Setup cached+retry session ---
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+openmeteo = make_client('.cache', expire_after=3600, retries=5, backoff_factor=0.2)
 
-url = "https://archive-api.open-meteo.com/v1/archive"
+# archive endpoint, or a local stand-in when OPENMETEO_BASE_URL is set
+url = endpoint("archive")
 
 
-LOCATIONS = {
-    "Encina":      (32.69, -117.1611),
-    "Point Loma":  (32.697, -117.236),
-    "South Bay":   (32.592, -117.087)
-}
+# sewershed polygons (any file geopandas reads, one or more polygons per plant);
+# None fetches the single WEATHER_LOCATIONS point of each plant, as before
+SEWERSHED_FILE = None
+
+# weather grid spacing in degrees inside the sewersheds (about the archive's ERA5-Land resolution)
+GRID_STEP = 0.1
 
 START_DATE = date(2022, 1, 1)
 END_DATE   = date(2025, 10, 31)
 
 
-DAILY_VARS = ["relative_humidity_2m_mean",
-              "temperature_2m_max",
-              "temperature_2m_min",
-              "wind_speed_10m_mean"]
-
-
-def fetch_location_data(name, lat, lon):
-    """Fetch daily weather data for a single location"""
-
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "start_date": START_DATE.isoformat(),
-        "end_date": END_DATE.isoformat(),
-        "daily": DAILY_VARS,
-        "timezone": "America/Los_Angeles"
-    }
-
-    responses = openmeteo.weather_api(url, params=params)
-    response = responses[0]
+HOURLY_VARS = ["relative_humidity_2m",
+               "temperature_2m",
+               "wind_speed_10m"]
 
-    daily = response.Daily()
-
-    humidity = daily.Variables(0).ValuesAsNumpy()
-    temp_max = daily.Variables(1).ValuesAsNumpy()
-    temp_min = daily.Variables(2).ValuesAsNumpy()
-    wind_avg = daily.Variables(3).ValuesAsNumpy()
-
-    dates = pd.date_range(
-        start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-        end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-        freq=pd.Timedelta(seconds=daily.Interval()),
-        inclusive="left"
-    )
-
-    df = pd.DataFrame({
-        "date": dates,
-        "max_temp_c": temp_max,
-        "min_temp_c": temp_min,
-        "avg_humidity_%": humidity,
-        "avg_wind_speed_m_s": wind_avg
-    })
-
-    return df
-
-
-all_data = {}
-
-for name, (lat, lon) in LOCATIONS.items():
-    df = fetch_location_data(name, lat, lon)
-    all_data[name] = df
+# daily features derived from the single hourly download
+DAILY_STATS = {
+    "temperature_2m": ["max", "min"],
+    "relative_humidity_2m": ["mean"],
+    "wind_speed_10m": ["mean"],
+}
 
-    filename = f"weather_{name}.csv"
-    df.to_csv(filename, index=False)
-    print(f"Saved CSV: {filename}")
 
+def plant_cells(path=SEWERSHED_FILE, step=GRID_STEP):
+    """
+    Points to fetch with their plant: the weather grid cells inside the sewershed
+    polygons of `path` (cached by sewersheds.grid_assignment), or one point per
+    plant from WEATHER_LOCATIONS when no polygon file is given
+    """
+
+    if path is None:
+        return pd.DataFrame([(lat, lon, plant) for plant, (lat, lon) in WEATHER_LOCATIONS.items()],
+                            columns=["lat", "lon", "plant"])
+    index = SewershedIndex(load_sewersheds(path))
+    return grid_assignment(index, step)
+
+
+def fetch_plant_data(cells):
+    """Fetch hourly weather for every point, aggregate each point to local days and average the points of each plant"""
+
+    # request local days so START_DATE and END_DATE cover all 24 hours
+    hourly_frames = fetch_hourly_many(cells["lat"], cells["lon"],
+                                      START_DATE.isoformat(), END_DATE.isoformat(),
+                                      variables=HOURLY_VARS, url=url, client=openmeteo,
+                                      timezone=LOCAL_TZ)
+
+    daily_frames = []
+    for plant, hourly in zip(cells["plant"], hourly_frames):
+        daily = hourly_to_daily(hourly, DAILY_STATS, tz=LOCAL_TZ)
+        daily_frames.append(daily.assign(plant=plant))
+    cell_days = pd.concat(daily_frames)
+
+    plant_days = cell_days.groupby(["plant", "date"]).mean()
+
+    data = {}
+    for plant, daily in plant_days.groupby(level="plant"):
+        daily = daily.droplevel("plant")
+        data[plant] = pd.DataFrame({
+            "date": daily.index,
+            "max_temp_c": daily["temperature_2m_max"].to_numpy(),
+            "min_temp_c": daily["temperature_2m_min"].to_numpy(),
+            "avg_humidity_%": daily["relative_humidity_2m_mean"].to_numpy(),
+            "avg_wind_speed_m_s": daily["wind_speed_10m_mean"].to_numpy()
+        })
+
+    return data
+
+
+if __name__ == "__main__":
+    cells = plant_cells()
+    print(cells.groupby("plant").size().rename("points").to_string())
+
+    all_data = fetch_plant_data(cells)
+
+    params = {"start": START_DATE.isoformat(), "end": END_DATE.isoformat(),
+              "grid_step": GRID_STEP, "sewersheds": SEWERSHED_FILE, "url": url}
+    for name, df in all_data.items():
+        filename = f"weather_{name}.csv"
+        # stored once in Output/ (skipped when unchanged) and linked here
+        get_store().save_csv(df, filename, links=[filename], params=params, index=False)
+        print(f"Saved CSV: {filename}")
@@ -0,0 +1,272 @@
+import os
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import openmeteo_requests
+import pandas as pd
+import requests_cache
+from retry_requests import retry
+
+'''Hourly Open-Meteo fetching and hourly -> daily aggregation shared by the weather scripts'''
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+# set to e.g. http://127.0.0.1:8765 to send every fetch to a local stand-in server
+BASE_URL_ENV = "OPENMETEO_BASE_URL"
+
+LOCAL_TZ = "America/Los_Angeles"
+
+HOURLY_VARS = ["temperature_2m",
+               "relative_humidity_2m",
+               "wind_speed_10m"]
+
+# short column names used by weather_vis for each hourly variable
+HOURLY_COLUMNS = {
+    "temperature_2m": "temperature",
+    "relative_humidity_2m": "humidity",
+    "wind_speed_10m": "wind_speed",
+}
+
+_default_client = None
+
+
+def make_client(cache_name: str = ".cache", expire_after: int = 3600, retries: int = 5,
+                backoff_factor: float = 0.2) -> openmeteo_requests.Client:
+    """Build an Open-Meteo client on top of a cached+retry session.
+
+    Args:
+        cache_name: Name of the requests_cache sqlite file.
+        expire_after: Cache lifetime in seconds.
+        retries: Number of retries for failed requests.
+        backoff_factor: Exponential backoff factor between retries.
+
+    Returns:
+        `openmeteo_requests.Client` that can be shared across fetches.
+    """
+
+    cache_session = requests_cache.CachedSession(cache_name, expire_after=expire_after)
+    retry_session = retry(cache_session, retries=retries, backoff_factor=backoff_factor)
+    return openmeteo_requests.Client(session=retry_session)
+
+
+def get_client() -> openmeteo_requests.Client:
+    """Return the module-wide shared client, creating it on first use."""
+
+    global _default_client
+    if _default_client is None:
+        _default_client = make_client()
+    return _default_client
+
+
+def endpoint(kind: str, base_url: Optional[str] = None) -> str:
+    """Resolve the URL of an Open-Meteo endpoint.
+
+    Args:
+        kind: 'forecast' or 'archive'.
+        base_url: Optional server root (e.g. 'http://127.0.0.1:8765'). Defaults
+            to the OPENMETEO_BASE_URL environment variable; when neither is set
+            the public Open-Meteo hosts are used.
+
+    Returns:
+        Full endpoint URL, '<base_url>/v1/<kind>' when a base URL is given.
+    """
+
+    urls = {"forecast": FORECAST_URL, "archive": ARCHIVE_URL}
+    assert kind in urls, f"kind must be one of {list(urls)}"
+    base_url = base_url or os.environ.get(BASE_URL_ENV)
+    if base_url:
+        return f"{base_url.rstrip('/')}/v1/{kind}"
+    return urls[kind]
+
+
+def fetch_hourly(lat: float, lon: float, start: str, end: str,
+                 variables: Sequence[str] = HOURLY_VARS, url: str = FORECAST_URL,
+                 client: Optional[openmeteo_requests.Client] = None,
+                 timezone: str = "UTC") -> pd.DataFrame:
+    """Fetch hourly data for a single location using the FlatBuffers response.
+
+    Values are taken straight from `ValuesAsNumpy()` so no per-element Python
+    conversion happens; the time axis is rebuilt from Time/TimeEnd/Interval.
+
+    Args:
+        lat: Latitude of location (decimal degrees).
+        lon: Longitude of location (decimal degrees).
+        start: Start date in 'YYYY-MM-DD' format.
+        end: End date in 'YYYY-MM-DD' format.
+        variables: Open-Meteo hourly variable names to request.
+        url: Forecast or archive endpoint.
+        client: Optional shared `openmeteo_requests.Client`.
+        timezone: Timezone `start` and `end` are taken in. Pass the timezone
+            the hours are later grouped by (e.g. LOCAL_TZ) so the first and
+            last days are complete.
+
+    Returns:
+        DataFrame with a tz-aware UTC 'time' column and one column per variable
+        (named as requested).
+
+    Raises:
+        AssertionError: if the response does not contain the requested variables.
+    """
+
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "hourly": list(variables),
+        "start_date": start,
+        "end_date": end,
+        "timezone": timezone,
+    }
+
+    client = client or get_client()
+    response = client.weather_api(url, params=params)[0]
+    return _hourly_frame(response, variables)
+
+
+def _hourly_frame(response, variables: Sequence[str]) -> pd.DataFrame:
+    """Hourly section of one FlatBuffers response as a DataFrame."""
+
+    hourly = response.Hourly()
+    assert hourly is not None, "Unexpected API response: missing 'hourly'"
+    assert hourly.VariablesLength() == len(variables), "API hourly response missing variables"
+
+    times = pd.date_range(
+        start=pd.to_datetime(hourly.Time(), unit="s", utc=True),
+        end=pd.to_datetime(hourly.TimeEnd(), unit="s", utc=True),
+        freq=pd.Timedelta(seconds=hourly.Interval()),
+        inclusive="left"
+    )
+
+    data = {"time": times}
+    for i, var in enumerate(variables):
+        values = hourly.Variables(i).ValuesAsNumpy()
+        assert len(values) == len(times), f"API hourly response for '{var}' has wrong length"
+        data[var] = values
+
+    return pd.DataFrame(data)
+
+
+def fetch_hourly_many(lats: Sequence[float], lons: Sequence[float], start: str, end: str,
+                      variables: Sequence[str] = HOURLY_VARS, url: str = FORECAST_URL,
+                      client: Optional[openmeteo_requests.Client] = None,
+                      timezone: str = "UTC", batch_size: int = 50) -> Iterable[pd.DataFrame]:
+    """Fetch hourly data for many locations, several coordinates per request.
+
+    Open-Meteo accepts comma-separated coordinate lists and answers with one
+    response per coordinate, so a grid of points costs one request per
+    `batch_size` points instead of one per point.
+
+    Args:
+        lats: Latitudes (decimal degrees).
+        lons: Longitudes, same length as `lats`.
+        start, end, variables, url, client, timezone: As in `fetch_hourly`.
+        batch_size: Coordinates per request.
+
+    Yields:
+        One hourly DataFrame per location (see `fetch_hourly`), in input order.
+
+    Raises:
+        AssertionError: if the coordinate lists differ in length or a response is missing.
+    """
+
+    lats = list(lats)
+    lons = list(lons)
+    assert len(lats) == len(lons), "lats and lons must have the same length"
+    client = client or get_client()
+
+    for lo in range(0, len(lats), batch_size):
+        params = {
+            "latitude": lats[lo:lo + batch_size],
+            "longitude": lons[lo:lo + batch_size],
+            "hourly": list(variables),
+            "start_date": start,
+            "end_date": end,
+            "timezone": timezone,
+        }
+        responses = client.weather_api(url, params=params)
+        assert len(responses) == len(params["latitude"]), "API returned the wrong number of locations"
+        for response in responses:
+            yield _hourly_frame(response, variables)
+
+
+def _stat_name(stat: Union[str, float]) -> str:
+    if isinstance(stat, str):
+        return stat
+    return f"q{int(round(stat * 100)):02d}"
+
+
+def hourly_to_daily(df: pd.DataFrame, stats: Dict[str, Iterable[Union[str, float]]],
+                    tz: str = LOCAL_TZ, time_col: str = "time") -> pd.DataFrame:
+    """Aggregate an hourly frame into local-day statistics.
+
+    Day boundaries are taken in `tz` (naive times are treated as UTC), so a
+    day covers local midnight to midnight like the daily API variables do.
+
+    Args:
+        df: Hourly DataFrame with a time column and numeric variable columns.
+        stats: Mapping of column -> statistics. Each statistic is one of
+            'mean', 'min', 'max' or a quantile given as a float in [0, 1].
+        tz: Timezone used for the day boundaries.
+        time_col: Name of the time column in `df`.
+
+    Returns:
+        DataFrame indexed by 'date' (local midnight, expressed in UTC) with a
+        column '<column>_<stat>' per requested statistic, e.g. 'temperature_2m_max'
+        or 'wind_speed_10m_q90'.
+
+    Raises:
+        AssertionError: if a column or statistic is unknown.
+    """
+
+    assert time_col in df.columns, f"'{time_col}' column does not exist"
+
+    times = pd.DatetimeIndex(df[time_col])
+    if times.tz is None:
+        times = times.tz_localize("UTC")
+    days = times.tz_convert(tz).normalize()
+    day_codes, day_index = pd.factorize(days, sort=True)
+    n_days = len(day_index)
+
+    out: Dict[str, np.ndarray] = {}
+    for col, col_stats in stats.items():
+        assert col in df.columns, f"'{col}' column does not exist"
+        values = df[col].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        codes = day_codes[valid]
+        vals = values[valid]
+        counts = np.bincount(codes, minlength=n_days)
+        empty = counts == 0
+
+        # sort once by (day, value) so min/max/quantiles are index lookups
+        order = np.lexsort((vals, codes))
+        sorted_vals = vals[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        for stat in col_stats:
+            name = f"{col}_{_stat_name(stat)}"
+            if stat == "mean":
+                sums = np.bincount(codes, weights=vals, minlength=n_days)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result = sums / counts
+            elif stat in ("min", "max") or isinstance(stat, (int, float)):
+                q = {"min": 0.0, "max": 1.0}.get(stat, stat)
+                assert 0.0 <= q <= 1.0, f"quantile must be in [0, 1], got {q}"
+                # linear interpolation between order statistics, same as np.quantile
+                pos = starts + q * np.maximum(counts - 1, 0)
+                lo = np.floor(pos).astype(np.int64)
+                hi = np.ceil(pos).astype(np.int64)
+                lo = np.minimum(lo, max(len(sorted_vals) - 1, 0))
+                hi = np.minimum(hi, max(len(sorted_vals) - 1, 0))
+                if len(sorted_vals) == 0:
+                    result = np.full(n_days, np.nan)
+                else:
+                    frac = pos - np.floor(pos)
+                    result = sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * frac
+            else:
+                raise AssertionError(f"unknown statistic '{stat}'")
+            result = np.where(empty, np.nan, result)
+            out[name] = result
+
+    daily = pd.DataFrame(out, index=day_index.tz_convert("UTC"))
+    daily.index.name = "date"
+    return daily
@@ -1,28 +1,45 @@
 import argparse
 import os
+import sys
 from datetime import datetime, timedelta
 from typing import Dict, Tuple, Optional
 
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
+import openmeteo_requests
 import osmnx as ox
-import requests
+
+from sewersheds import PLANT_LOCATIONS, plants_frame
+from weather_dashboard import WeatherDashboard, precompute_correlations
+from weather_hourly import HOURLY_COLUMNS, HOURLY_VARS, endpoint, fetch_hourly, get_client
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Corelating_Weather_to_Wastewater'))
+from panel import build_panel
+from sampling_coverage import MAX_GAP_DAYS
 
 
 def fetch_weather(lat: float, lon: float, start: Optional[str] = None, end: Optional[str] = None,
-                  session: Optional[requests.Session] = None) -> pd.DataFrame:
+                  client: Optional[openmeteo_requests.Client] = None,
+                  base_url: Optional[str] = None) -> pd.DataFrame:
     """Fetch hourly weather data from Open-Meteo for a single location.
 
+    Uses the FlatBuffers response from `openmeteo_requests`, so values come
+    straight out of `ValuesAsNumpy()` without building Python lists.
+
     Args:
         lat: Latitude of location (decimal degrees).
         lon: Longitude of location (decimal degrees).
         start: Start date in 'YYYY-MM-DD' format. Defaults to 2 days ago (UTC).
         end: End date in 'YYYY-MM-DD' format. Defaults to today (UTC).
-        session: Optional `requests.Session` to use for HTTP requests.
+        client: Optional shared `openmeteo_requests.Client`. Defaults to the
+            cached+retry client from `weather_hourly.get_client()`.
+        base_url: Optional server root to fetch from instead of the public
+            forecast API (see `weather_hourly.endpoint`).
 
     Returns:
         DataFrame with columns ['time', 'temperature', 'humidity', 'wind_speed'].
+        'time' is in UTC (tz-naive).
 
     Raises:
         AssertionError: if inputs are out of range or API response missing expected keys.
@@ -36,46 +53,9 @@ def fetch_weather(lat: float, lon: float, start: Optional[str] = None, end: Opti
     if end is None:
         end = datetime.utcnow().strftime("%Y-%m-%d")
 
-    url = "https://api.open-meteo.com/v1/forecast"
-    # Open-Meteo expects hourly variables as comma-separated string
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "hourly": "temperature_2m,relativehumidity_2m,windspeed_10m",
-        "start_date": start,
-        "end_date": end,
-        "timezone": "UTC",
-    }
-
-    sess = session or requests.Session()
-    resp = sess.get(url, params=params, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
-
-    assert "hourly" in data, "Unexpected API response: missing 'hourly'"
-    hourly = data["hourly"]
-
-    # Accept multiple possible key names with fallbacks
-    time_key = "time"
-    temp_key = "temperature_2m"
-    hum_key = "relativehumidity_2m"
-    wind_key = "windspeed_10m"
-
-    for key in (time_key, temp_key, hum_key, wind_key):
-        assert key in hourly, f"API hourly response missing '{key}'"
-
-    times = pd.to_datetime(hourly[time_key])
-    temp = pd.Series(hourly[temp_key])
-    humidity = pd.Series(hourly[hum_key])
-    wind = pd.Series(hourly[wind_key])
-
-    min_len = min(len(times), len(temp), len(humidity), len(wind))
-    df = pd.DataFrame({
-        "time": times[:min_len],
-        "temperature": temp.iloc[:min_len].astype(float).values,
-        "humidity": humidity.iloc[:min_len].astype(float).values,
-        "wind_speed": wind.iloc[:min_len].astype(float).values,
-    })
+    df = fetch_hourly(lat, lon, start, end, variables=HOURLY_VARS, url=endpoint("forecast", base_url), client=client)
+    df = df.rename(columns=HOURLY_COLUMNS)
+    df["time"] = df["time"].dt.tz_localize(None)
 
     return df
 
@@ -132,27 +112,22 @@ def main(args=None):
     parser.add_argument("--end", help="End date YYYY-MM-DD", default=None)
     parser.add_argument("--out", help="Output directory to save figures", default="outputs")
     parser.add_argument("--show", help="Show plots interactively", action="store_true")
+    parser.add_argument("--dashboard", help="Open the interactive dashboard (time slider + variable selector)",
+                        action="store_true")
+    parser.add_argument("--base-url", help="Fetch from this server root (e.g. a local openmeteo_standin)",
+                        default=None)
     parsed = parser.parse_args(args=args)
 
     os.makedirs(parsed.out, exist_ok=True)
 
-    locations: Dict[str, Tuple[float, float]] = {
-        "Encina": (33.1387, -117.3258),
-        "Point Loma": (32.6840, -117.2400),
-        "South Bay": (32.5881, -117.0330),
-    }
-
-    # build GeoDataFrame of station points (lon, lat order for points_from_xy)
-    lons = [lon for _, lon in locations.values()]
-    lats = [lat for lat, _ in locations.values()]
-    gdf = gpd.GeoDataFrame({"location": list(locations.keys())},
-                           geometry=gpd.points_from_xy(lons, lats),
-                           crs="EPSG:4326")
+    locations: Dict[str, Tuple[float, float]] = PLANT_LOCATIONS
+    gdf = plants_frame(locations)
 
     weather_data = []
-    sess = requests.Session()
+    client = get_client()
     for loc, (lat, lon) in locations.items():
-        df = fetch_weather(lat=lat, lon=lon, start=parsed.start, end=parsed.end, session=sess)
+        df = fetch_weather(lat=lat, lon=lon, start=parsed.start, end=parsed.end, client=client,
+                           base_url=parsed.base_url)
         df["location"] = loc
         weather_data.append(df)
 
@@ -175,6 +150,15 @@ def main(args=None):
         plt.show()
     plt.close(fig)
 
+    if parsed.dashboard:
+        # wastewater correlations of every plant, computed once for all views
+        correlations = precompute_correlations(build_panel(covid_path=None), list(locations),
+                                               max_gap=MAX_GAP_DAYS)
+        dashboard = WeatherDashboard(combined, gdf, county, correlations=correlations)
+        dashboard.add_controls()
+        plt.show()
+        return
+
     # pick most recent timestamp and plot each variable
     latest = combined["time"].max()
     for var in ["temperature", "humidity", "wind_speed"]: